@@ -0,0 +1,107 @@
+"""Compare caller-side logging cost: synchronous stream handler vs the queue pipeline.
+
+The synchronous setup mirrors the old logging.basicConfig: f-string messages
+formatted and written on the calling thread. The queue setup uses the app's
+BoundedQueueHandler, SamplingFilter and StructuredFormatter with lazy
+%-style arguments, so the caller only pays for enqueueing.
+
+Each setup runs against /dev/null and against a slow sink that takes 200us
+per write, like stderr piped to a busy log collector.
+
+Run from the backend directory:
+    python benchmarks/bench_logging.py [records]
+"""
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueListener
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from main import BoundedQueueHandler, SamplingFilter, StructuredFormatter
+
+FORM_DATA = {
+    "name": "Customer",
+    "email": "customer@example.com",
+    "phone": "+974 3040 1080",
+    "message": "We would like a quotation for MEP works on a new villa compound. " * 10
+}
+
+
+class SlowSink:
+    """Stream whose writes block for a fixed time"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+def sync_logger(stream):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    bench_logger = logging.getLogger("bench.sync")
+    bench_logger.handlers = [handler]
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    return bench_logger, None
+
+
+def queued_logger(stream, sample_rate):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(StructuredFormatter(json_output=True))
+    log_queue = queue.Queue(maxsize=100000)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter({"bench.queued": sample_rate}))
+    bench_logger = logging.getLogger("bench.queued")
+    bench_logger.handlers = [queue_handler]
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return bench_logger, listener
+
+
+def run_sync(bench_logger, records):
+    start = time.perf_counter()
+    for i in range(records):
+        bench_logger.info(f"Form data: {FORM_DATA}")
+    return time.perf_counter() - start
+
+
+def run_queued(bench_logger, records):
+    start = time.perf_counter()
+    for i in range(records):
+        bench_logger.info("Form data: %s", FORM_DATA)
+    return time.perf_counter() - start
+
+
+def compare(label, stream, records):
+    bench_logger, _ = sync_logger(stream)
+    sync_elapsed = run_sync(bench_logger, records)
+
+    print(f"\n{label}: {records} INFO records with a form payload, caller-side cost per record")
+    print(f"sync StreamHandler + f-string:      {sync_elapsed / records * 1e6:9.2f} us")
+    for sample_rate in (1.0, 0.1):
+        bench_logger, listener = queued_logger(stream, sample_rate)
+        elapsed = run_queued(bench_logger, records)
+        listener.stop()
+        print(f"queue pipeline, sample rate {sample_rate:<4}: {elapsed / records * 1e6:9.2f} us  ({sync_elapsed / elapsed:.1f}x)")
+
+
+def main(records):
+    with open(os.devnull, "w") as devnull:
+        compare("/dev/null", devnull, records)
+    compare("slow sink", SlowSink(0.0002), max(records // 10, 1))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
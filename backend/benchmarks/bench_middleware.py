@@ -0,0 +1,134 @@
+"""Compare the old BaseHTTPMiddleware CORS shim with HeaderMiddleware.
+
+Drives both ASGI apps in-process (no network, no server) so the numbers only
+reflect middleware overhead on a small JSON route and a StaticFiles image.
+
+Run from the backend directory:
+    python benchmarks/bench_middleware.py [requests]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+
+from main import HeaderMiddleware, CORS_ALLOW_METHODS, CORS_EXPOSE_HEADERS
+
+IMAGES_DIR = BACKEND_DIR / "images"
+ORIGINS = ["http://localhost:3000", "http://localhost:5173"]
+
+
+def add_routes(app):
+    @app.get("/json")
+    async def small_json():
+        return {"success": True, "status": "healthy", "database_connected": True}
+
+    app.mount("/images", StaticFiles(directory=IMAGES_DIR), name="images")
+
+
+def build_legacy_app():
+    app = FastAPI()
+    add_routes(app)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=ORIGINS,
+        allow_credentials=True,
+        allow_methods=CORS_ALLOW_METHODS,
+        allow_headers=["*"],
+        expose_headers=CORS_EXPOSE_HEADERS
+    )
+
+    @app.middleware("http")
+    async def add_cors_and_pagination_headers(request: Request, call_next):
+        response = await call_next(request)
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = "*"
+        response.headers["Access-Control-Expose-Headers"] = "X-Total-Count, Content-Range"
+        return response
+
+    return app
+
+
+def build_header_middleware_app():
+    app = FastAPI()
+    add_routes(app)
+    app.add_middleware(
+        HeaderMiddleware,
+        allow_origins=ORIGINS,
+        allow_any_origin=True,
+        allow_methods=CORS_ALLOW_METHODS,
+        expose_headers=CORS_EXPOSE_HEADERS
+    )
+    return app
+
+
+async def call(app, path, method="GET", headers=None):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"origin", b"http://localhost:5173")] + (headers or []),
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8000),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path, requests, method="GET", headers=None):
+    # Warm up routing and file caches
+    for _ in range(50):
+        await call(app, path, method, headers)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, path, method, headers)
+    elapsed = time.perf_counter() - start
+    return requests / elapsed
+
+
+async def main(requests):
+    image = next(path for path in sorted(IMAGES_DIR.iterdir()) if path.is_file())
+    cases = [
+        ("small JSON", "/json", "GET", None),
+        ("static image", f"/images/{image.name}", "GET", None),
+        ("preflight", "/json", "OPTIONS", [(b"access-control-request-method", b"POST")]),
+    ]
+    apps = [("BaseHTTPMiddleware shim", build_legacy_app()), ("HeaderMiddleware", build_header_middleware_app())]
+
+    print(f"{requests} sequential requests per case\n")
+    print(f"{'case':<14} {'app':<26} {'req/s':>10}")
+    for label, path, method, headers in cases:
+        baseline = None
+        for name, app in apps:
+            rate = await measure(app, path, requests, method, headers)
+            speedup = f"  ({rate / baseline:.2f}x)" if baseline else ""
+            baseline = baseline or rate
+            print(f"{label:<14} {name:<26} {rate:>10.0f}{speedup}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,90 @@
+"""Compare the old submissions serialization path with BSONResponse.
+
+The old path converted `_id` and `submitted_at` in a Python loop, then went
+through FastAPI's jsonable_encoder and the stdlib JSON encoder. The new path
+encodes raw documents from the cursor with orjson.
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py [documents]
+"""
+import sys
+import time
+from copy import deepcopy
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from main import BSONResponse, encode_documents
+
+
+def make_submissions(count):
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": "+974 3040 1080",
+            "message": "We would like a quotation for MEP works on a new villa compound. " * 15,
+            "uploaded_files": [
+                {
+                    "original_name": "drawings.pdf",
+                    "saved_name": f"{i:08x}_drawings.pdf",
+                    "file_size": 482133,
+                    "content_type": "application/pdf"
+                }
+            ],
+            "submitted_at": now - timedelta(minutes=i),
+            "status": "new"
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_render(docs):
+    submissions = []
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+        if "submitted_at" in doc:
+            doc["submitted_at"] = doc["submitted_at"].isoformat()
+        submissions.append(doc)
+    content = {"success": True, "submissions": submissions, "total_count": len(submissions)}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def bson_render(docs):
+    submissions, returned_count = encode_documents(iter(docs))
+    content = {"success": True, "submissions": submissions, "total_count": returned_count}
+    return BSONResponse(content).body
+
+
+def measure(render, template, rounds):
+    elapsed = 0.0
+    for _ in range(rounds):
+        # Fresh documents each round, as a cursor would yield
+        docs = deepcopy(template)
+        start = time.perf_counter()
+        render(docs)
+        elapsed += time.perf_counter() - start
+    return elapsed / rounds
+
+
+def main(count):
+    template = make_submissions(count)
+    rounds = max(3, 20000 // count)
+
+    legacy = measure(legacy_render, template, rounds)
+    fast = measure(bson_render, template, rounds)
+    print(f"{count} submissions, {rounds} rounds")
+    print(f"legacy loop + jsonable_encoder: {legacy * 1000:8.2f} ms")
+    print(f"encode_documents + orjson:      {fast * 1000:8.2f} ms  ({legacy / fast:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,107 @@
+"""Measure cold start: module import cost and time until the server answers.
+
+The import report runs `python -X importtime -c "import main"` and lists the
+slowest top-level imports by cumulative time.
+
+The startup part launches uvicorn in each STARTUP_MODE and records how long
+it takes until /health/live answers (the port is bound and serving) and
+until /health/ready answers 200 (MongoDB connected and migrations applied).
+Without MONGODB_CONNECTION_STRING in the environment an unreachable server
+with a short selection timeout stands in for a slow Atlas cluster, so
+/health/ready never becomes ready and the blocking mode shows the full cost
+of waiting on the database before binding.
+
+Run from the backend directory:
+    python benchmarks/bench_startup.py [runs]
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+UNREACHABLE_MONGODB = "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=5000"
+READY_TIMEOUT = 60
+
+
+def import_report(top):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Indented two spaces per level after the bar: keep main and what it imports directly
+        if not name.startswith(" main") and not name.startswith("   ") or name.startswith("     "):
+            continue
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+
+    rows.sort(reverse=True)
+    total = next((cumulative for cumulative, _, name in rows if name == "main"), None)
+    print(f"Import time for main: {total / 1000:.1f} ms" if total else "main not found in import report")
+    print(f"{'module':<32} {'cumulative ms':>14} {'self ms':>9}")
+    for cumulative, self_time, name in [row for row in rows if row[2] != "main"][:top]:
+        print(f"{name:<32} {cumulative / 1000:14.1f} {self_time / 1000:9.1f}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, started, deadline, expect_status=200):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == expect_status:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def measure_startup(mode):
+    port = free_port()
+    env = dict(os.environ, STARTUP_MODE=mode, LOG_LEVEL="WARNING")
+    env.setdefault("MONGODB_CONNECTION_STRING", UNREACHABLE_MONGODB)
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + READY_TIMEOUT
+        live = wait_for(f"http://127.0.0.1:{port}/health/live", started, deadline)
+        ready = wait_for(f"http://127.0.0.1:{port}/health/ready", started, min(deadline, time.perf_counter() + 15))
+        return live, ready
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def format_seconds(value):
+    return f"{value * 1000:9.0f} ms" if value is not None else "  timed out"
+
+
+def main(runs):
+    import_report(top=12)
+
+    print(f"\nTime from process launch ({runs} runs per mode)")
+    print(f"{'mode':<12} {'live':>12} {'ready':>12}")
+    for mode in ("background", "blocking"):
+        for _ in range(runs):
+            live, ready = measure_startup(mode)
+            print(f"{mode:<12} {format_seconds(live):>12} {format_seconds(ready):>12}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,105 @@
+"""Measure how request throughput scales with uvicorn worker processes.
+
+For each worker count the app is started with `uvicorn --workers N` in
+MULTI_WORKER_MODE and driven by client processes that each hold one
+keep-alive connection and send GET requests for a fixed duration. The path
+defaults to /api/website-images, which is served from each worker's
+in-memory gallery snapshot; pass another path to measure a different route.
+
+MongoDB is taken from MONGODB_CONNECTION_STRING. Without it the gallery
+endpoint answers an empty gallery, which still exercises routing,
+middleware and serialization.
+
+Run from the backend directory:
+    python benchmarks/bench_workers.py [path] [seconds]
+"""
+import http.client
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CLIENTS_PER_WORKER = 4
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_live(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health/live")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def run_client(args):
+    port, path, seconds = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    requests = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        requests += 1
+    conn.close()
+    return requests
+
+
+def measure(workers, path, seconds):
+    port = free_port()
+    # All clients share one address, so the per-client rate limit is turned off
+    env = dict(os.environ, MULTI_WORKER_MODE="true", LOG_LEVEL="WARNING", RATE_LIMITS="")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_until_live(port):
+            return None
+        # Let every worker finish its lifespan startup before measuring
+        time.sleep(2)
+        clients = workers * CLIENTS_PER_WORKER
+        with multiprocessing.Pool(clients) as pool:
+            counts = pool.map(run_client, [(port, path, seconds)] * clients)
+        return sum(counts) / seconds
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(path, seconds):
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, cores // 2, cores} - {0})
+    print(f"GET {path}, {seconds}s per run, {CLIENTS_PER_WORKER} clients per worker, {cores} cores")
+    print(f"{'workers':>7} {'req/s':>10} {'scaling':>8}")
+    baseline = None
+    for workers in worker_counts:
+        rate = measure(workers, path, seconds)
+        if rate is None:
+            print(f"{workers:>7}  server did not start")
+            continue
+        baseline = baseline or rate
+        print(f"{workers:>7} {rate:10.0f} {rate / baseline:7.2f}x")
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "/api/website-images",
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    )
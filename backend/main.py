@@ -1,14 +1,18 @@
-from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form, Query, Depends
+from fastapi.responses import JSONResponse, FileResponse, Response, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, PyMongoError
-from datetime import datetime
+from starlette.datastructures import MutableHeaders
+from pymongo import MongoClient, UpdateOne, ReturnDocument, monitoring
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, PyMongoError
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional, List
-from contextlib import asynccontextmanager
-from bson import ObjectId
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from bson import ObjectId, Decimal128
 from pathlib import Path
+from urllib.parse import quote, urlencode
+from email.utils import formatdate
+from html import escape as html_escape
 import os
 from dotenv import load_dotenv
 import logging
@@ -16,15 +20,50 @@ import resend
 import json
 import uuid
 import hashlib
+import re
+import hmac
 import shutil
+import zipfile
+import csv
+import io
 import base64
+import orjson
+import gzip
+import zlib
+import time
+import bisect
+import heapq
+import queue
+import threading
+import asyncio
+import random
+import atexit
+import socket
+import functools
+import gridfs
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from collections import deque, OrderedDict
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError as BotoClientError
+except ImportError:  # boto3 is only needed for STORAGE_BACKEND=s3
+    boto3 = None
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (handlers are installed by setup_logging below)
 logger = logging.getLogger(__name__)
+detail_logger = logging.getLogger(f"{__name__}.detail")
+slow_request_logger = logging.getLogger(f"{__name__}.slow_requests")
 
 # MongoDB connection
 MONGODB_CONNECTION_STRING = os.getenv("MONGODB_CONNECTION_STRING")
@@ -33,6 +72,11 @@ DATABASE_NAME = "MECHGENZ"
 COLLECTION_NAME = "contact_submissions"
 GALLERY_COLLECTION_NAME = "website_images"
 ADMIN_COLLECTION_NAME = "admin_users"
+METADATA_COLLECTION_NAME = "app_metadata"
+EVENTS_COLLECTION_NAME = "live_events"
+SESSIONS_COLLECTION_NAME = "admin_sessions"
+IDEMPOTENCY_COLLECTION_NAME = "idempotency_keys"
+SCHEMA_MARKER_ID = "schema_version"
 
 # Resend configuration
 RESEND_API_KEY = os.getenv("RESEND_API_KEY", "re_G4hUh9oq_Dcaj4qoYtfWWv5saNvgG7ZEW")
@@ -40,6 +84,10 @@ ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "mechgenz4@gmail.com")
 COMPANY_EMAIL = os.getenv("COMPANY_EMAIL", "info@mechgenz.com")
 VERIFIED_DOMAIN = os.getenv("VERIFIED_DOMAIN", None)
 
+# Resend accepts at most 100 messages per batch call
+RESEND_BATCH_SIZE = 100
+MAX_BATCH_REPLIES = 500
+
 # Email notification list - both admin Gmail and company Outlook
 NOTIFICATION_EMAILS = [ADMIN_EMAIL, COMPANY_EMAIL]
 
@@ -47,28 +95,195 @@ NOTIFICATION_EMAILS = [ADMIN_EMAIL, COMPANY_EMAIL]
 resend.api_key = RESEND_API_KEY
 
 # File upload configuration
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-IMAGES_DIR = Path("images")
-IMAGES_DIR.mkdir(exist_ok=True)
+# Local storage directories; point both at a shared volume when running several instances
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+IMAGES_DIR = Path(os.getenv("IMAGES_DIR", "images"))
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".pdf", ".doc", ".docx", ".txt"}
 
+# Object storage for attachments and gallery images: "local", "gridfs" or "s3"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", str(256 * 1024)))
+# Storage calls run in their own bounded thread pool; local writes are fsynced before they are renamed into place
+STORAGE_THREADS = int(os.getenv("STORAGE_THREADS", "8"))
+STORAGE_FSYNC = os.getenv("STORAGE_FSYNC", "true").lower() == "true"
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+# Uploads larger than one part use multipart upload; S3 requires parts of at least 5MB
+S3_MULTIPART_PART_SIZE = int(os.getenv("S3_MULTIPART_PART_SIZE", str(8 * 1024 * 1024)))
+
+# Signed attachment URLs; without ATTACHMENT_URL_SECRET the key is derived from the MongoDB
+# connection string so every worker and instance agrees on it
+ATTACHMENT_URL_SECRET = os.getenv("ATTACHMENT_URL_SECRET")
+SIGNED_URL_TTL = int(os.getenv("SIGNED_URL_TTL", "3600"))
+EMAIL_SIGNED_URL_TTL = int(os.getenv("EMAIL_SIGNED_URL_TTL", str(7 * 24 * 3600)))
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "https://mechgenz-backend.onrender.com").rstrip("/")
+URL_SIGNING_KEY = (
+    ATTACHMENT_URL_SECRET.encode() if ATTACHMENT_URL_SECRET
+    else hmac.new(MONGODB_CONNECTION_STRING.encode(), b"attachment-urls", hashlib.sha256).digest() if MONGODB_CONNECTION_STRING
+    else os.urandom(32)
+)
+
+# Admin sessions: signed bearer tokens whose revocation each worker rechecks at most every SESSION_CHECK_INTERVAL seconds
+ADMIN_AUTH_REQUIRED = os.getenv("ADMIN_AUTH_REQUIRED", "true").lower() == "true"
+ADMIN_SESSION_TTL = int(os.getenv("ADMIN_SESSION_TTL", str(12 * 3600)))
+SESSION_CHECK_INTERVAL = float(os.getenv("SESSION_CHECK_INTERVAL", "30"))
+ADMIN_SESSION_SECRET = os.getenv("ADMIN_SESSION_SECRET")
+SESSION_SIGNING_KEY = (
+    ADMIN_SESSION_SECRET.encode() if ADMIN_SESSION_SECRET
+    else hmac.new(MONGODB_CONNECTION_STRING.encode(), b"admin-sessions", hashlib.sha256).digest() if MONGODB_CONNECTION_STRING
+    else os.urandom(32)
+)
+# scrypt cost for admin passwords; hashes with other parameters are upgraded at the next login
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Idempotency-Key support on POST /api/contact: completed responses are replayed for IDEMPOTENCY_TTL seconds,
+# and a claim abandoned by a crashed request can be retried after IDEMPOTENCY_PENDING_TIMEOUT seconds
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "120"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1000"))
+
+# Contact form spam screening over the last SPAM_WINDOW seconds: "quarantine" stores suspected spam with
+# status "spam", "flag" keeps the normal status; both skip the notification emails. "off" disables it.
+SPAM_FILTER_MODE = os.getenv("SPAM_FILTER_MODE", "quarantine").lower()
+SPAM_WINDOW = float(os.getenv("SPAM_WINDOW", "3600"))
+SPAM_DUPLICATE_LIMIT = int(os.getenv("SPAM_DUPLICATE_LIMIT", "2"))  # near-identical messages allowed before screening
+SPAM_SENDER_LIMIT = int(os.getenv("SPAM_SENDER_LIMIT", "5"))  # submissions per email address
+SPAM_IP_LIMIT = int(os.getenv("SPAM_IP_LIMIT", "10"))  # submissions per client address
+SPAM_MIN_WORDS = 8  # shorter messages are too generic to compare
+SPAM_INDEX_SIZE = int(os.getenv("SPAM_INDEX_SIZE", "10000"))
+
+# Deleted submissions and gallery images can be restored for PURGE_GRACE_PERIOD seconds; the leader then removes
+# their files and documents, PURGE_BATCH_SIZE of each at a time, checking every PURGE_INTERVAL seconds
+PURGE_GRACE_PERIOD = int(os.getenv("PURGE_GRACE_PERIOD", str(7 * 24 * 3600)))
+PURGE_INTERVAL = float(os.getenv("PURGE_INTERVAL", "60"))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "100"))
+
+# Cursor batch size for streaming exports and insert batch size for NDJSON imports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+MAX_IMPORT_ERRORS = 100
+
+# Per-client token buckets for public routes, "METHOD /path=requests/seconds"; an empty value disables them.
+# The same routes are shed with 503 while in-flight requests or MongoDB latency are over their thresholds (0 disables).
+RATE_LIMITS = os.getenv("RATE_LIMITS", "POST /api/contact=5/60,GET /api/website-images=120/60")
+FORWARDED_HOPS = int(os.getenv("FORWARDED_HOPS", "0"))  # proxies appending to X-Forwarded-For
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "200"))
+SHED_MONGO_LATENCY_MS = float(os.getenv("SHED_MONGO_LATENCY_MS", "500"))
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "5"))
+
+# Response compression configuration
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of below-WARNING records kept per logger, e.g. "main.detail=0.1"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "main.detail=0.1")
+
+# Request timing configuration
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+
+# MongoDB query audit configuration
+QUERY_AUDIT_ENABLED = os.getenv("QUERY_AUDIT_ENABLED", "true").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+
+# Background health monitor configuration
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))
+RESEND_HEALTH_CHECK_INTERVAL = float(os.getenv("RESEND_HEALTH_CHECK_INTERVAL", "300"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+HEALTH_HISTORY_SIZE = int(os.getenv("HEALTH_HISTORY_SIZE", "20"))
+
+# Startup configuration: "background" binds immediately and connects/migrates in a task, "blocking" finishes first
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+STARTUP_RETRY_MAX_DELAY = float(os.getenv("STARTUP_RETRY_MAX_DELAY", "30"))
+
+# Multi-worker configuration: leader lease for one-time work and cross-worker gallery invalidation
+MULTI_WORKER_MODE = os.getenv("MULTI_WORKER_MODE", "false").lower() == "true"
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))
+GALLERY_SYNC_INTERVAL = float(os.getenv("GALLERY_SYNC_INTERVAL", "2"))
+MIGRATION_WAIT_TIMEOUT = float(os.getenv("MIGRATION_WAIT_TIMEOUT", "120"))
+
+# Live admin events over Server-Sent Events; in multi-worker mode they are shared through MongoDB for EVENT_TTL seconds
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "1000"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_INTERVAL = float(os.getenv("EVENT_HEARTBEAT_INTERVAL", "15"))
+EVENT_RETRY_MS = int(os.getenv("EVENT_RETRY_MS", "3000"))
+EVENT_TTL = int(os.getenv("EVENT_TTL", "3600"))
+
+# Gallery snapshot served from memory between writes
+GALLERY_CACHE_TTL = int(os.getenv("GALLERY_CACHE_TTL", "60"))
+
+# Admin dashboard payload cache; submission changes in this worker invalidate it sooner
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+MAX_DASHBOARD_RECENT = 50
+
 # Global MongoDB client
 mongodb_client = None
 database = None
 collection = None
 gallery_collection = None
 admin_collection = None
+metadata_collection = None
+events_collection = None
+sessions_collection = None
+idempotency_collection = None
 is_db_connected = False
 
+# Progress of the deferred startup work (connectivity check and migrations)
+startup_state = {
+    "status": "pending",
+    "mode": STARTUP_MODE,
+    "attempts": 0,
+    "schema_version": None,
+    "started_at": None,
+    "completed_at": None,
+    "duration_ms": None
+}
+startup_task = None
+
+# Precompressed /api/website-images payload, when it was built and the gallery write version
+gallery_snapshot = None
+gallery_snapshot_built_at = 0.0
+gallery_version = 0
+
+# Admin dashboard payloads by number of recent submissions, with when each was built
+dashboard_cache = {}
+dashboard_version = 0
+
 def hash_password(password: str) -> str:
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password with salted scrypt; slow by design, so call it from a worker thread"""
+    salt = os.urandom(16)
+    derived = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${derived.hex()}"
 
 def verify_password(password: str, hashed: str) -> bool:
-    """Verify a password against its hash"""
-    return hash_password(password) == hashed
+    """Verify a password against a scrypt hash or a legacy unsalted SHA-256 hash"""
+    if hashed.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, expected = hashed.split("$")
+            derived = hashlib.scrypt(
+                password.encode(), salt=bytes.fromhex(salt), n=int(n), r=int(r), p=int(p), dklen=len(expected) // 2
+            )
+        except ValueError:
+            return False
+        return hmac.compare_digest(derived.hex(), expected)
+    return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed)
+
+def password_needs_rehash(hashed: str) -> bool:
+    return not hashed.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+# Verified against when the login email is unknown, so the response takes as long as a wrong password
+DUMMY_PASSWORD_HASH = f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${'00' * 16}${'00' * 64}"
 
 def initialize_gallery_data():
     """Initialize gallery collection with default website images"""
@@ -81,7 +296,7 @@ def initialize_gallery_data():
         # Check if gallery data already exists
         existing_count = gallery_collection.count_documents({})
         if existing_count > 0:
-            logger.info(f"Gallery collection already has {existing_count} images")
+            logger.info("Gallery collection already has %s images", existing_count)
             return True
             
         logger.info("Initializing gallery collection with default images...")
@@ -224,18 +439,11 @@ def initialize_gallery_data():
         
         # Insert all default images
         result = gallery_collection.insert_many(default_images)
-        logger.info(f"✅ Successfully initialized gallery with {len(result.inserted_ids)} images")
-        
-        # Create indexes for better performance
-        gallery_collection.create_index("id", unique=True)
-        gallery_collection.create_index("category")
-        gallery_collection.create_index("updated_at")
-        
-        logger.info("✅ Gallery database indexes created")
+        logger.info("✅ Successfully initialized gallery with %s images", len(result.inserted_ids))
         return True
         
     except Exception as e:
-        logger.error(f"❌ Error initializing gallery data: {e}")
+        logger.error("❌ Error initializing gallery data: %s", e)
         return False
 
 def initialize_default_admin():
@@ -279,18 +487,144 @@ def initialize_default_admin():
         }
         
         result = admin_collection.insert_one(default_admin)
-        logger.info(f"✅ Default admin created with ID: {result.inserted_id}")
+        logger.info("✅ Default admin created with ID: %s", result.inserted_id)
         logger.info("Default login: mechgenz4@gmail.com / mechgenz4")
         
         return True
         
     except Exception as e:
-        logger.error(f"❌ Error creating default admin: {e}")
+        logger.error("❌ Error creating default admin: %s", e)
         return False
 
+def ensure_indexes():
+    """Create the indexes the API queries rely on"""
+    gallery_collection.create_index("id", unique=True)
+    gallery_collection.create_index("category")
+    gallery_collection.create_index("updated_at")
+    collection.create_index([("submitted_at", -1), ("_id", -1)])
+    collection.create_index([("status", 1), ("submitted_at", -1), ("_id", -1)])
+    logger.info("✅ Database indexes created")
+
+def migrate_export_indexes():
+    """Schema 2: (submitted_at, _id) keys so exports can sort and resume on an index"""
+    collection.create_index([("submitted_at", -1), ("_id", -1)])
+    collection.create_index([("status", 1), ("submitted_at", -1), ("_id", -1)])
+    # The new indexes cover every query the old ones served
+    for name in ("submitted_at_-1", "status_1_submitted_at_-1"):
+        if name in collection.index_information():
+            collection.drop_index(name)
+
+def migrate_import_index():
+    """Schema 3: unique natural key on imported submissions, used to skip duplicates"""
+    collection.create_index(
+        "natural_key",
+        unique=True,
+        partialFilterExpression={"natural_key": {"$exists": True}}
+    )
+
+def migrate_live_events():
+    """Schema 4: shared live events expire once no reconnecting client can still need them"""
+    events_collection.create_index("created_at", expireAfterSeconds=EVENT_TTL)
+
+def migrate_admin_sessions():
+    """Schema 5: sessions are removed once their tokens expire"""
+    sessions_collection.create_index("expires_at", expireAfterSeconds=0)
+    sessions_collection.create_index("admin_id")
+
+def migrate_idempotency_keys():
+    """Schema 6: idempotency keys are removed once they can no longer be replayed"""
+    idempotency_collection.create_index("expires_at", expireAfterSeconds=0)
+
+def migrate_soft_delete():
+    """Schema 7: the purge worker finds expired deletions by purge_after"""
+    collection.create_index("purge_after", sparse=True)
+    gallery_collection.create_index("purge_after", sparse=True)
+    gallery_collection.create_index("trashed_files.purge_after", sparse=True)
+
+def migrate_attachment_index():
+    """Schema 8: signed downloads look up the submission owning an attachment"""
+    collection.create_index("uploaded_files.saved_name")
+
+def migrate_idempotent_submissions():
+    """Schema 9: stale idempotency claims look up the submission they stored"""
+    collection.create_index("idempotency_key", sparse=True)
+
+def migrate_initial_schema():
+    """Schema 1: indexes, default gallery and default admin"""
+    ensure_indexes()
+    if not initialize_gallery_data():
+        raise RuntimeError("Gallery initialization failed")
+    if not initialize_default_admin():
+        raise RuntimeError("Default admin initialization failed")
+
+# Ordered schema migrations, each applied once per database and tracked by the schema marker document
+MIGRATIONS = [
+    (1, "indexes, default gallery and admin", migrate_initial_schema),
+    (2, "submission indexes for keyset exports", migrate_export_indexes),
+    (3, "natural key index for imports", migrate_import_index),
+    (4, "expiry of shared live events", migrate_live_events),
+    (5, "admin session expiry", migrate_admin_sessions),
+    (6, "idempotency key expiry", migrate_idempotency_keys),
+    (7, "purge indexes for soft deletes", migrate_soft_delete),
+    (8, "attachment lookup index", migrate_attachment_index),
+    (9, "idempotency key index on submissions", migrate_idempotent_submissions)
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def run_migrations():
+    """Apply migrations newer than the schema marker; returns the resulting schema version"""
+    marker = metadata_collection.find_one({"_id": SCHEMA_MARKER_ID}) or {}
+    current_version = marker.get("version", 0)
+    
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+        logger.info("Applying schema migration %s: %s", version, description)
+        migrate()
+        metadata_collection.update_one(
+            {"_id": SCHEMA_MARKER_ID},
+            {"$set": {"version": version, "migrated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        current_version = version
+    
+    return current_version
+
+def apply_migrations():
+    """Run migrations here, or with several workers wait for the lease holder to run them"""
+    deadline = time.monotonic() + MIGRATION_WAIT_TIMEOUT
+    while True:
+        if not MULTI_WORKER_MODE or acquire_leader_lease():
+            return run_migrations()
+        marker = metadata_collection.find_one({"_id": SCHEMA_MARKER_ID}) or {}
+        if marker.get("version", 0) >= SCHEMA_VERSION:
+            return marker["version"]
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Schema still behind version {SCHEMA_VERSION} after {MIGRATION_WAIT_TIMEOUT}s")
+        time.sleep(1)
+
+def create_mongodb_client():
+    """Create the MongoDB client and collection handles; pymongo connects lazily, so this does not block"""
+    global mongodb_client, database, collection, gallery_collection, admin_collection, metadata_collection, events_collection, sessions_collection
+    global idempotency_collection
+    
+    event_listeners = [MongoMetricsListener()]
+    if QUERY_AUDIT_ENABLED:
+        event_listeners.append(QueryAuditListener(threshold_ms=SLOW_QUERY_THRESHOLD_MS))
+    mongodb_client = MongoClient(MONGODB_CONNECTION_STRING, event_listeners=event_listeners)
+    
+    database = mongodb_client[DATABASE_NAME]
+    collection = database[COLLECTION_NAME]
+    gallery_collection = database[GALLERY_COLLECTION_NAME]
+    admin_collection = database[ADMIN_COLLECTION_NAME]
+    metadata_collection = database[METADATA_COLLECTION_NAME]
+    events_collection = database[EVENTS_COLLECTION_NAME]
+    sessions_collection = database[SESSIONS_COLLECTION_NAME]
+    idempotency_collection = database[IDEMPOTENCY_COLLECTION_NAME]
+
 def connect_to_mongodb():
-    """Initialize MongoDB connection"""
-    global mongodb_client, database, collection, gallery_collection, admin_collection, is_db_connected
+    """Initialize MongoDB connection and bring the schema up to date"""
+    global is_db_connected
     
     try:
         if not MONGODB_CONNECTION_STRING:
@@ -299,35 +633,29 @@ def connect_to_mongodb():
             return False
         
         logger.info("Attempting to connect to MongoDB...")
-        mongodb_client = MongoClient(MONGODB_CONNECTION_STRING)
+        if mongodb_client is None:
+            create_mongodb_client()
         
         # Test the connection
         mongodb_client.admin.command('ping')
         logger.info("Successfully connected to MongoDB Atlas")
-        
-        # Get database and collections
-        database = mongodb_client[DATABASE_NAME]
-        collection = database[COLLECTION_NAME]
-        gallery_collection = database[GALLERY_COLLECTION_NAME]
-        admin_collection = database[ADMIN_COLLECTION_NAME]
         is_db_connected = True
         
-        logger.info(f"Database: {DATABASE_NAME}, Collections: {COLLECTION_NAME}, {GALLERY_COLLECTION_NAME}, {ADMIN_COLLECTION_NAME}")
-        
-        # Initialize gallery data if empty
-        initialize_gallery_data()
+        logger.info("Database: %s, Collections: %s, %s, %s", DATABASE_NAME, COLLECTION_NAME, GALLERY_COLLECTION_NAME, ADMIN_COLLECTION_NAME)
         
-        # Initialize default admin if none exists
-        initialize_default_admin()
+        # Seed and index only when the schema marker is behind
+        version = apply_migrations()
+        startup_state["schema_version"] = version
+        logger.info("Schema version %s", version)
         
         return True
         
     except ConnectionFailure as e:
-        logger.error(f"Failed to connect to MongoDB: {e}")
+        logger.error("Failed to connect to MongoDB: %s", e)
         is_db_connected = False
         return False
     except Exception as e:
-        logger.error(f"Error connecting to MongoDB: {e}")
+        logger.error("Error connecting to MongoDB: %s", e)
         is_db_connected = False
         return False
 
@@ -347,71 +675,1813 @@ def format_file_size(bytes_size):
         bytes_size /= 1024.0
     return f"{bytes_size:.1f} TB"
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Lifespan event handler for startup and shutdown"""
-    # Startup
-    logger.info("Starting up MECHGENZ Contact Form API...")
-    logger.info(f"📧 Email configuration:")
-    logger.info(f"   Admin Email: {ADMIN_EMAIL}")
-    logger.info(f"   Company Email: {COMPANY_EMAIL}")
-    logger.info(f"   Notification Recipients: {', '.join(NOTIFICATION_EMAILS)}")
+# ============================================================================
+# OBJECT STORAGE
+# ============================================================================
+
+class LocalStorage:
+    """Objects stored as files in a directory; writes go to a temp file and are renamed into place"""
+    
+    backend = "local"
+    
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+    
+    def path(self, key):
+        # Keys are flat file names; anything that could escape the directory is rejected
+        if not key or Path(key).name != key or key in (".", ".."):
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return self.root / key
+    
+    def put(self, key, source, content_type=None):
+        """Store bytes or a readable file object; returns its size and SHA-256"""
+        path = self.path(key)
+        temp_path = path.with_name(f".{key}.{uuid.uuid4().hex[:8]}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as buffer:
+                for chunk in iter_chunks(source, digest=digest):
+                    buffer.write(chunk)
+                    size += len(chunk)
+                if STORAGE_FSYNC:
+                    buffer.flush()
+                    os.fsync(buffer.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        if STORAGE_FSYNC:
+            self.sync_directory()
+        return {"size": size, "sha256": digest.hexdigest()}
+    
+    def sync_directory(self):
+        # Makes the rename itself durable; directories cannot be opened this way on every platform
+        try:
+            fd = os.open(self.root, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def open_range(self, key, start=0, end=None):
+        """Yield the bytes from start to end (inclusive) in chunks"""
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(STORAGE_CHUNK_SIZE if remaining is None else min(STORAGE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+    
+    def read(self, key):
+        return self.path(key).read_bytes()
+    
+    def stat(self, key):
+        """Size, content type and modification time, or None if the object does not exist"""
+        try:
+            st = self.path(key).stat()
+        except FileNotFoundError:
+            return None
+        return {"size": st.st_size, "content_type": None, "modified": datetime.utcfromtimestamp(st.st_mtime)}
+    
+    def exists(self, key):
+        return self.path(key).is_file()
+    
+    def delete(self, key):
+        """Delete an object; returns whether it existed"""
+        try:
+            self.path(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def delete_many(self, keys):
+        """Delete several objects; returns how many existed"""
+        return sum(self.delete(key) for key in keys)
+
+
+class GridFSStorage:
+    """Objects stored in a GridFS bucket of the application database"""
+    
+    backend = "gridfs"
+    
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+    
+    @property
+    def bucket(self):
+        # Bound to the current database so forked workers use their own client
+        if database is None:
+            raise RuntimeError("Database connection not available")
+        return gridfs.GridFSBucket(database, bucket_name=self.bucket_name, chunk_size_bytes=STORAGE_CHUNK_SIZE)
+    
+    def file_doc(self, key):
+        return database[f"{self.bucket_name}.files"].find_one({"filename": key}, sort=[("uploadDate", -1)])
+    
+    def put(self, key, source, content_type=None):
+        digest = hashlib.sha256()
+        with self.bucket.open_upload_stream(key, metadata={"content_type": content_type}) as stream:
+            for chunk in iter_chunks(source, digest=digest):
+                stream.write(chunk)
+        return {"size": stream.length, "sha256": digest.hexdigest()}
+    
+    def open_range(self, key, start=0, end=None):
+        try:
+            grid_out = self.bucket.open_download_stream_by_name(key)
+        except gridfs.errors.NoFile:
+            raise FileNotFoundError(key)
+        with grid_out:
+            grid_out.seek(start)
+            remaining = (grid_out.length if end is None else end + 1) - start
+            while remaining > 0:
+                chunk = grid_out.read(min(STORAGE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    def read(self, key):
+        try:
+            with self.bucket.open_download_stream_by_name(key) as grid_out:
+                return grid_out.read()
+        except gridfs.errors.NoFile:
+            raise FileNotFoundError(key)
+    
+    def stat(self, key):
+        doc = self.file_doc(key)
+        if doc is None:
+            return None
+        return {
+            "size": doc["length"],
+            "content_type": (doc.get("metadata") or {}).get("content_type"),
+            "modified": doc["uploadDate"]
+        }
+    
+    def exists(self, key):
+        return self.file_doc(key) is not None
+    
+    def delete(self, key):
+        bucket = self.bucket
+        deleted = False
+        # GridFS keeps every revision under the same name
+        for doc in database[f"{self.bucket_name}.files"].find({"filename": key}, {"_id": 1}):
+            bucket.delete(doc["_id"])
+            deleted = True
+        return deleted
+    
+    def delete_many(self, keys):
+        """Delete every revision of several objects with one query per collection"""
+        docs = list(database[f"{self.bucket_name}.files"].find({"filename": {"$in": list(keys)}}, {"_id": 1, "filename": 1}))
+        file_ids = [doc["_id"] for doc in docs]
+        if file_ids:
+            # Same order as GridFSBucket.delete: the file disappears first, orphaned chunks are harmless
+            database[f"{self.bucket_name}.files"].delete_many({"_id": {"$in": file_ids}})
+            database[f"{self.bucket_name}.chunks"].delete_many({"files_id": {"$in": file_ids}})
+        return len({doc["filename"] for doc in docs})
+
+
+class S3Storage:
+    """Objects stored under a key prefix in an S3-compatible bucket (AWS S3, MinIO, R2)"""
+    
+    backend = "s3"
+    
+    def __init__(self, bucket, prefix):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = None
+        self._client_pid = None
+    
+    @property
+    def client(self):
+        # boto3 clients are thread-safe but must not cross a fork
+        if self._client is None or self._client_pid != os.getpid():
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=S3_ENDPOINT_URL,
+                region_name=S3_REGION,
+                config=BotoConfig(signature_version="s3v4", retries={"max_attempts": 3})
+            )
+            self._client_pid = os.getpid()
+        return self._client
+    
+    def object_key(self, key):
+        if not key or "/" in key:
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return f"{self.prefix}{key}"
+    
+    def put(self, key, source, content_type=None):
+        """Single PUT for small objects, multipart upload once the first part fills up"""
+        object_key = self.object_key(key)
+        extra = {"ContentType": content_type} if content_type else {}
+        digest = hashlib.sha256()
+        chunks = iter_chunks(source, S3_MULTIPART_PART_SIZE, digest)
+        first_part = next(chunks, b"")
+        
+        if len(first_part) < S3_MULTIPART_PART_SIZE:
+            self.client.put_object(Bucket=self.bucket, Key=object_key, Body=first_part, **extra)
+            return {"size": len(first_part), "sha256": digest.hexdigest()}
+        
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=object_key, **extra)["UploadId"]
+        parts = []
+        size = 0
+        try:
+            part = first_part
+            while part:
+                response = self.client.upload_part(
+                    Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                    PartNumber=len(parts) + 1, Body=part
+                )
+                parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+                size += len(part)
+                part = next(chunks, b"")
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+        return {"size": size, "sha256": digest.hexdigest()}
+    
+    def get_object(self, key, **kwargs):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.object_key(key), **kwargs)
+        except BotoClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise FileNotFoundError(key)
+            raise
+    
+    def open_range(self, key, start=0, end=None):
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        body = self.get_object(key, Range=byte_range)["Body"]
+        try:
+            yield from body.iter_chunks(STORAGE_CHUNK_SIZE)
+        finally:
+            body.close()
+    
+    def read(self, key):
+        return self.get_object(key)["Body"].read()
+    
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except BotoClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound"):
+                return None
+            raise
+        return {"size": head["ContentLength"], "content_type": head.get("ContentType"), "modified": head["LastModified"]}
+    
+    def exists(self, key):
+        return self.stat(key) is not None
+    
+    def delete(self, key):
+        # S3 deletes are idempotent, so check first to report whether the object existed
+        existed = self.exists(key)
+        if existed:
+            self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        return existed
+    
+    def delete_many(self, keys):
+        """Delete objects 1000 per request; S3 does not say which keys were missing, so all count"""
+        keys = list(keys)
+        for start in range(0, len(keys), 1000):
+            response = self.client.delete_objects(Bucket=self.bucket, Delete={
+                "Objects": [{"Key": self.object_key(key)} for key in keys[start:start + 1000]],
+                "Quiet": True
+            })
+            errors = response.get("Errors") or []
+            if errors:
+                raise RuntimeError(f"Failed to delete {len(errors)} objects: {errors[0].get('Message')}")
+        return len(keys)
+
+
+def iter_chunks(source, chunk_size=None, digest=None):
+    """Yield a bytes payload or a readable file object in chunks, feeding each chunk to digest"""
+    chunk_size = chunk_size or STORAGE_CHUNK_SIZE
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        chunks = (bytes(source[offset:offset + chunk_size]) for offset in range(0, len(source), chunk_size))
+    else:
+        chunks = iter(lambda: source.read(chunk_size), b"")
+    for chunk in chunks:
+        if digest is not None:
+            digest.update(chunk)
+        yield chunk
+
+def content_etag(sha256):
+    """Strong ETag from a stored content hash, or None for files stored before hashes were recorded"""
+    return f'"{sha256}"' if sha256 else None
+
+def create_storage(namespace, local_dir):
+    """Build the configured storage backend for one namespace ("uploads" or "images")"""
+    if STORAGE_BACKEND == "gridfs":
+        return GridFSStorage(namespace)
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, f"{S3_PREFIX}{namespace}/")
+    return LocalStorage(local_dir)
+
+attachment_storage = create_storage("uploads", UPLOAD_DIR)
+image_storage = create_storage("images", IMAGES_DIR)
+
+def new_storage_executor():
+    return ThreadPoolExecutor(max_workers=STORAGE_THREADS, thread_name_prefix="storage")
+
+# Blocking storage calls queue here instead of stalling the event loop on a slow disk or bucket
+storage_executor = new_storage_executor()
+
+async def run_storage(func, *args):
+    """Run a blocking storage call in the storage thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(storage_executor, functools.partial(func, *args))
+
+async def stat_objects(storage, keys):
+    """Stat several objects concurrently; returns {key: stat or None}"""
+    keys = list(dict.fromkeys(keys))
+    return dict(zip(keys, await asyncio.gather(*(run_storage(storage.stat, key) for key in keys))))
+
+def parse_range_header(range_header, size):
+    """Parse a single-range 'bytes=' header into (start, end); None means serve the whole object"""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def etag_matches(if_none_match, etag):
+    return etag is not None and any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+async def storage_response(storage, key, request, filename=None, media_type=None, etag=None):
+    """Serve an object with Range/If-Range support: sendfile for local storage, a chunked stream otherwise"""
+    if etag and etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    if isinstance(storage, LocalStorage):
+        path = storage.path(key)
+        if not await run_storage(path.is_file):
+            raise HTTPException(status_code=404, detail="File not found")
+        # FileResponse handles Range and checks If-Range against this ETag
+        return FileResponse(path=path, filename=filename, media_type=media_type, headers={"etag": etag} if etag else None)
+    
+    info = await run_storage(storage.stat, key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    size = info["size"]
+    media_type = media_type or info["content_type"] or "application/octet-stream"
+    last_modified = format_http_date(info["modified"])
+    headers = {"Accept-Ranges": "bytes", "Last-Modified": last_modified}
+    if etag:
+        headers["ETag"] = etag
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+    
+    # A stale If-Range validator means the client's partial copy is outdated: send the whole object
+    if_range = request.headers.get("if-range")
+    use_range = if_range is None or if_range in (etag, last_modified)
+    byte_range = parse_range_header(request.headers.get("range"), size) if size and use_range else None
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(storage.open_range(key), media_type=media_type, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(storage.open_range(key, start, end), status_code=206, media_type=media_type, headers=headers)
+
+def format_http_date(value):
+    return formatdate(value.replace(tzinfo=timezone.utc).timestamp() if value.tzinfo is None else value.timestamp(), usegmt=True)
+
+async def serve_stored_image(filename: str, request: Request):
+    """Serve gallery images from non-local storage at the same /images URLs"""
+    return await storage_response(image_storage, filename, request)
+
+class RequestTimings:
+    """Per-request phase durations reported in the Server-Timing header"""
+    __slots__ = ("start", "phases")
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+    
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+    
+    def server_timing(self, total):
+        entries = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+request_timings = ContextVar("request_timings", default=None)
+request_id_var = ContextVar("request_id", default="-")
+
+def record_phase(phase, seconds):
+    """Add time to a phase of the current request, if one is being timed"""
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+def record_parse_phase():
+    """Record the time spent before the handler ran, mostly request body parsing"""
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add("parse", time.perf_counter() - timings.start)
+
+@contextmanager
+def timed_phase(phase):
+    """Time a block of work as a phase of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+def bson_default(obj):
+    """Encode BSON types that orjson does not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def encode_documents(cursor):
+    """Serialize documents straight from a cursor into a JSON array fragment"""
+    encoded = [orjson.dumps(doc, default=bson_default) for doc in cursor]
+    return orjson.Fragment(b"[" + b",".join(encoded) + b"]"), len(encoded)
+
+class BSONResponse(JSONResponse):
+    """JSON response rendered with orjson, understanding ObjectId and datetime values"""
+    
+    def render(self, content: Any) -> bytes:
+        with timed_phase("render"):
+            return orjson.dumps(content, default=bson_default)
+
+async def run_startup_tasks(retry=True):
+    """Connect to MongoDB and apply migrations off the request path, retrying with backoff"""
+    delay = 1.0
+    startup_state["status"] = "running"
+    started = time.perf_counter()
+    
+    while True:
+        startup_state["attempts"] += 1
+        success = await asyncio.to_thread(connect_to_mongodb)
+        if success or not retry or not MONGODB_CONNECTION_STRING:
+            break
+        logger.warning("MongoDB startup attempt %s failed, retrying in %.0fs", startup_state['attempts'], delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, STARTUP_RETRY_MAX_DELAY)
+    
+    startup_state["completed_at"] = datetime.utcnow()
+    startup_state["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
     
-    success = connect_to_mongodb()
     if not success:
+        startup_state["status"] = "failed"
         logger.warning("Failed to initialize MongoDB connection - API will run but form submissions will fail")
         logger.info("To fix this:")
         logger.info("1. Create a .env file in the backend directory")
         logger.info("2. Add your MongoDB connection string: MONGODB_CONNECTION_STRING=your_connection_string")
         logger.info("3. Restart the server")
+        return
+    
+    startup_state["status"] = "complete"
+    await probe("mongodb", ping_mongodb)
+    # Requests served while seeding may have cached an empty gallery
+    invalidate_gallery_snapshot()
+    logger.info("✅ Gallery management system ready")
+    logger.info("✅ Admin system ready")
+    logger.info("✅ Dual email notification system ready")
+    logger.info("✅ File upload system ready")
+    logger.info("Startup tasks finished in %sms", startup_state['duration_ms'])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan event handler for startup and shutdown"""
+    global startup_task
+    
+    # Startup
+    logger.info("Starting up MECHGENZ Contact Form API...")
+    logger.info("📧 Email configuration:")
+    logger.info("   Admin Email: %s", ADMIN_EMAIL)
+    logger.info("   Company Email: %s", COMPANY_EMAIL)
+    logger.info("   Notification Recipients: %s", ', '.join(NOTIFICATION_EMAILS))
+    
+    startup_state["started_at"] = datetime.utcnow()
+    if STARTUP_MODE == "blocking":
+        await run_startup_tasks(retry=False)
     else:
-        logger.info("✅ Gallery management system ready")
-        logger.info("✅ Admin system ready")
-        logger.info("✅ Dual email notification system ready")
-        logger.info("✅ File upload system ready")
+        startup_task = asyncio.create_task(run_startup_tasks())
+        logger.info("Accepting requests; MongoDB connection and migrations continue in the background")
+    
+    start_health_monitor()
+    start_worker_tasks()
     
     yield
     
     # Shutdown
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+    await stop_health_monitor()
+    await stop_worker_tasks()
     close_mongodb_connection()
+    stop_logging()
 
 # Initialize FastAPI app with lifespan
 app = FastAPI(
     title="MECHGENZ Contact Form API",
     description="Backend API for handling contact form submissions with file uploads and gallery management",
     version="1.0.0",
+    default_response_class=BSONResponse,
     lifespan=lifespan
 )
 
-# Mount static files for image and upload serving
-app.mount("/images", StaticFiles(directory="images"), name="images")
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Mount static files for image serving; other storage backends stream through a route.
+# Attachments are only served through signed URLs or the submission download endpoint.
+if isinstance(image_storage, LocalStorage):
+    app.mount("/images", StaticFiles(directory=IMAGES_DIR), name="images")
+else:
+    app.add_api_route("/images/{filename}", serve_stored_image, methods=["GET"], include_in_schema=False)
+
+# ============================================================================
+# RATE LIMITING AND LOAD SHEDDING
+# ============================================================================
+
+def parse_rate_limits(spec):
+    """Parse "POST /api/contact=5/60,..." into {(method, path): (bucket capacity, tokens per second)}"""
+    limits = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        route, _, rate = entry.strip().rpartition("=")
+        method, _, path = route.strip().partition(" ")
+        requests, _, seconds = rate.partition("/")
+        limits[(method.upper(), path.strip())] = (float(requests), float(requests) / float(seconds or 1))
+    return limits
+
+# Moving average of MongoDB command latency, fed by the command listener
+mongo_latency_ewma = 0.0
+
+def observe_mongo_latency(seconds):
+    global mongo_latency_ewma
+    mongo_latency_ewma += 0.2 * (seconds - mongo_latency_ewma)
+
+def client_address(scope, forwarded_hops):
+    """Client IP from the socket, or from X-Forwarded-For entries appended by trusted proxies"""
+    if forwarded_hops:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                addresses = value.decode("latin-1").split(",")
+                return addresses[-min(forwarded_hops, len(addresses))].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class TrafficControlMiddleware:
+    """Pure ASGI middleware that rate limits public routes per client and sheds them under overload"""
+    
+    def __init__(self, app, limits, forwarded_hops=0, max_in_flight=0, mongo_latency_ms=0, retry_after=5, max_clients=10000):
+        self.app = app
+        self.limits = limits
+        self.forwarded_hops = forwarded_hops
+        self.max_in_flight = max_in_flight
+        self.mongo_latency = mongo_latency_ms / 1000
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        # (route, client) -> [tokens, last refill]; plain dict operations, all on the event loop
+        self.buckets = {}
+    
+    def take_token(self, key, capacity, rate, now):
+        """Spend one token from the client's bucket; returns 0, or seconds until a token is available"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_clients:
+                self.prune(now)
+            bucket = self.buckets[key] = [capacity, now]
+            RATE_LIMIT_CLIENTS.set(len(self.buckets))
+        
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+    
+    def prune(self, now):
+        # A bucket that has refilled behaves exactly like a new one
+        for key in [key for key, (tokens, updated) in self.buckets.items()
+                    if tokens + (now - updated) * self.limits[key[0]][1] >= self.limits[key[0]][0]]:
+            del self.buckets[key]
+        # Still full means many clients are active at once: forget the oldest quarter
+        if len(self.buckets) >= self.max_clients:
+            for key in list(self.buckets)[:len(self.buckets) // 4]:
+                del self.buckets[key]
+        RATE_LIMIT_CLIENTS.set(len(self.buckets))
+    
+    def shed_reason(self):
+        """Return why a public request should be shed right now, or None"""
+        # Open event streams are long-lived by design and do not indicate load
+        in_flight = HTTP_IN_FLIGHT.get() - LIVE_EVENT_SUBSCRIBERS.get()
+        if self.max_in_flight and in_flight > self.max_in_flight:
+            return "in_flight"
+        if self.mongo_latency and mongo_latency_ewma > self.mongo_latency:
+            # Shed a growing share as latency climbs, always letting some through to measure recovery
+            if random.random() < min(0.9, mongo_latency_ewma / self.mongo_latency - 1):
+                return "mongodb_latency"
+        return None
+    
+    async def reject(self, send, status, detail, retry_after):
+        body = orjson.dumps({"detail": detail})
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, int(retry_after + 0.999))).encode("latin-1"))
+        ]})
+        await send({"type": "http.response.body", "body": body})
+    
+    async def __call__(self, scope, receive, send):
+        route = (scope["method"], scope["path"]) if scope["type"] == "http" else None
+        limit = self.limits.get(route)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        reason = self.shed_reason()
+        if reason is not None:
+            LOAD_SHED.inc((reason,))
+            await self.reject(send, 503, "Server is busy, please try again shortly", self.retry_after)
+            return
+        
+        wait = self.take_token((route, client_address(scope, self.forwarded_hops)), *limit, time.monotonic())
+        if wait:
+            RATE_LIMITED.inc((scope["path"],))
+            await self.reject(send, 429, "Too many requests, please try again later", wait)
+            return
+        
+        await self.app(scope, receive, send)
+
+# Inside the CORS middleware, so rejections still carry CORS headers the browser can read
+app.add_middleware(
+    TrafficControlMiddleware,
+    limits=parse_rate_limits(RATE_LIMITS),
+    forwarded_hops=FORWARDED_HOPS,
+    max_in_flight=SHED_MAX_IN_FLIGHT,
+    mongo_latency_ms=SHED_MONGO_LATENCY_MS,
+    retry_after=SHED_RETRY_AFTER
+)
 
 # Get CORS origins from environment variable
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
+# The public site posts the contact form from origins outside ALLOWED_ORIGINS, so any origin is allowed unless disabled
+CORS_ALLOW_ANY_ORIGIN = os.getenv("CORS_ALLOW_ANY_ORIGIN", "true").lower() == "true"
+CORS_ALLOW_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+CORS_EXPOSE_HEADERS = ["X-Total-Count", "Content-Range", "X-Request-ID"]
+CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", "600"))
 
-# CORS middleware configuration
+class HeaderMiddleware:
+    """Pure ASGI middleware that adds CORS and pagination headers and answers preflight requests"""
+    
+    def __init__(self, app, allow_origins, allow_any_origin, allow_methods, expose_headers, max_age=600):
+        self.app = app
+        self.allow_any_origin = allow_any_origin or "*" in allow_origins
+        self.allow_origins = {origin.strip().encode("latin-1") for origin in allow_origins if origin.strip()}
+        
+        # Header tuples are built once so each response only pays for a list concatenation
+        self.response_headers = [(b"access-control-expose-headers", ", ".join(expose_headers).encode("latin-1"))]
+        self.preflight_headers = [
+            (b"access-control-allow-methods", ", ".join(allow_methods).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1"))
+        ]
+        if self.allow_any_origin:
+            self.response_headers.insert(0, (b"access-control-allow-origin", b"*"))
+            self.preflight_headers.insert(0, (b"access-control-allow-origin", b"*"))
+    
+    def origin_headers(self, origin):
+        """Return the per-origin headers, or None if the origin is not allowed"""
+        if self.allow_any_origin:
+            return []
+        if origin in self.allow_origins:
+            return [
+                (b"access-control-allow-origin", origin),
+                (b"access-control-allow-credentials", b"true"),
+                (b"vary", b"Origin")
+            ]
+        return None
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        origin = None
+        requested_method = None
+        requested_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                requested_method = value
+            elif name == b"access-control-request-headers":
+                requested_headers = value
+        
+        origin_headers = self.origin_headers(origin)
+        
+        # Answer CORS preflight directly without routing the request
+        if scope["method"] == "OPTIONS" and origin is not None and requested_method is not None:
+            if origin_headers is None:
+                headers = [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", b"22")]
+                await send({"type": "http.response.start", "status": 400, "headers": headers})
+                await send({"type": "http.response.body", "body": b"Disallowed CORS origin"})
+                return
+            
+            headers = self.preflight_headers + origin_headers
+            if requested_headers:
+                headers = headers + [(b"access-control-allow-headers", requested_headers)]
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        
+        if origin_headers is None:
+            await self.app(scope, receive, send)
+            return
+        
+        extra_headers = self.response_headers + origin_headers
+        
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + extra_headers
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
+
+# CORS and pagination headers for the website and admin panels
 app.add_middleware(
-    CORSMiddleware,
+    HeaderMiddleware,
     allow_origins=ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-    expose_headers=["X-Total-Count", "Content-Range", "Access-Control-Expose-Headers"]
+    allow_any_origin=CORS_ALLOW_ANY_ORIGIN,
+    allow_methods=CORS_ALLOW_METHODS,
+    expose_headers=CORS_EXPOSE_HEADERS,
+    max_age=CORS_MAX_AGE
 )
 
-# Add a middleware to include proper headers for admin panels
-@app.middleware("http")
-async def add_cors_and_pagination_headers(request: Request, call_next):
-    response = await call_next(request)
+# ============================================================================
+# RESPONSE COMPRESSION
+# ============================================================================
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "application/xml", "image/svg+xml")
+
+def choose_encoding(accept_encoding, available=("br", "gzip")):
+    """Pick the best content encoding the client accepts, or None for identity"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    
+    for coding in available:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def is_compressible(media_type):
+    """Return True for text-like content types worth compressing"""
+    media_type = media_type.split(";")[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+def compress_body(body, encoding):
+    """Compress a complete body with the given encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class StreamCompressor:
+    """Incremental gzip or brotli compressor for streamed response bodies"""
     
-    # Add CORS headers
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response.headers["Access-Control-Allow-Headers"] = "*"
-    response.headers["Access-Control-Expose-Headers"] = "X-Total-Count, Content-Range"
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
     
-    return response
+    def compress(self, chunk, final=False):
+        if self.encoding == "br":
+            data = self.compressor.process(chunk)
+            return data + (self.compressor.finish() if final else self.compressor.flush())
+        data = self.compressor.compress(chunk)
+        return data + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """Pure ASGI middleware that negotiates gzip or brotli for text responses above a size threshold"""
+    
+    def __init__(self, app, minimum_size=1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.available = ("br", "gzip") if brotli is not None else ("gzip",)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = choose_encoding(value.decode("latin-1"), self.available)
+                break
+        
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        compressor = None
+        passthrough = False
+        
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            
+            if message["type"] == "http.response.start":
+                # Hold the start message until the first body chunk shows the size
+                start_message = message
+                return
+            
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                
+                # Ranged and downloadable responses keep their bytes, so Range and If-Range resume still work
+                if (
+                    start["status"] in (204, 206, 304)
+                    or "content-encoding" in headers
+                    or "content-range" in headers
+                    or "accept-ranges" in headers
+                    or "content-disposition" in headers
+                    or not is_compressible(headers.get("content-type", ""))
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                # A strong ETag names exact bytes; the compressed body is only semantically equivalent
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if "content-length" in headers:
+                    del headers["content-length"]
+                
+                if not more_body:
+                    body = compress_body(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send({**start, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                
+                compressor = StreamCompressor(encoding)
+                await send({**start, "headers": headers.raw})
+            
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, final=not more_body),
+                "more_body": more_body
+            })
+        
+        await self.app(scope, receive, send_compressed)
+
+class PrecompressedPayload:
+    """Response body kept in identity, gzip and brotli form so it is compressed once per version"""
+    
+    def __init__(self, body, media_type="application/json"):
+        self.media_type = media_type
+        self.digest = hashlib.md5(body).hexdigest()
+        self.variants = {None: body}
+        if len(body) >= COMPRESSION_MIN_SIZE:
+            self.variants["gzip"] = compress_body(body, "gzip")
+            if brotli is not None:
+                self.variants["br"] = compress_body(body, "br")
+    
+    def etag(self, encoding):
+        # Each encoding is a different representation, so each gets its own strong validator
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+    
+    def response(self, request: Request):
+        """Serve the best stored variant for the request, or 304 if the client copy is current"""
+        available = [coding for coding in ("br", "gzip") if coding in self.variants]
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""), available)
+        headers = {"ETag": self.etag(encoding), "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+# Compress JSON and text responses for clients that accept it
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(labelnames, values, extra=""):
+    """Render a Prometheus label set"""
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+    kind = "counter"
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+    
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def get(self, labels=()):
+        return self.values.get(labels, 0)
+    
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    kind = "gauge"
+    
+    def dec(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+    
+    def set(self, value, labels=()):
+        self.values[labels] = value
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, keyed by a tuple of label values"""
+    kind = "histogram"
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.values = {}
+    
+    def observe(self, value, labels=()):
+        series = self.values.get(labels)
+        if series is None:
+            # Per-bucket counts followed by sum and count
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+    
+    def samples(self):
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = format_labels(self.labelnames, labels, f'le="{le}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {series[-2]}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {series[-1]}"
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+    
+    def __init__(self):
+        self.metrics = []
+    
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+HTTP_REQUESTS = METRICS.register(Counter("http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status")))
+HTTP_DURATION = METRICS.register(Histogram("http_request_duration_seconds", "HTTP request latency by method and route", ("method", "route")))
+HTTP_IN_FLIGHT = METRICS.register(Gauge("http_requests_in_flight", "HTTP requests currently being served"))
+UPLOAD_BYTES = METRICS.register(Counter("upload_bytes_total", "Bytes of uploaded files accepted, by kind", ("kind",)))
+UPLOAD_FILES = METRICS.register(Counter("upload_files_total", "Uploaded files accepted, by kind", ("kind",)))
+MONGO_DURATION = METRICS.register(Histogram("mongodb_command_duration_seconds", "MongoDB command latency by command", ("command",)))
+MONGO_FAILURES = METRICS.register(Counter("mongodb_command_failures_total", "Failed MongoDB commands by command", ("command",)))
+RESEND_DURATION = METRICS.register(Histogram("resend_request_duration_seconds", "Resend API call latency by operation", ("operation",)))
+RESEND_FAILURES = METRICS.register(Counter("resend_request_failures_total", "Failed Resend API calls by operation", ("operation",)))
+LOG_RECORDS = METRICS.register(Counter("log_records_total", "Log records queued for output, by level", ("level",)))
+LOG_RECORDS_DROPPED = METRICS.register(Counter("log_records_dropped_total", "Log records dropped because the log queue was full"))
+LOG_RECORDS_SAMPLED_OUT = METRICS.register(Counter("log_records_sampled_out_total", "Log records skipped by sampling, by logger", ("logger",)))
+LOG_QUEUE_DEPTH = METRICS.register(Gauge("log_queue_depth", "Log records waiting to be written"))
+LEADER = METRICS.register(Gauge("leader", "Whether this worker holds the leader lease"))
+LIVE_EVENT_SUBSCRIBERS = METRICS.register(Gauge("live_event_subscribers", "Open Server-Sent Events streams"))
+RATE_LIMITED = METRICS.register(Counter("rate_limited_requests_total", "Requests rejected with 429 by the per-client rate limit, by path", ("path",)))
+RATE_LIMIT_CLIENTS = METRICS.register(Gauge("rate_limit_buckets", "Client and route pairs tracked by the rate limiter"))
+LOAD_SHED = METRICS.register(Counter("shed_requests_total", "Public requests rejected with 503 by load shedding, by reason", ("reason",)))
+MONGO_LATENCY = METRICS.register(Gauge("mongodb_latency_ewma_seconds", "Moving average of MongoDB command latency used for load shedding"))
+PURGED = METRICS.register(Counter("purged_items_total", "Deleted items removed after their grace period, by kind", ("kind",)))
+SPAM_SCREENED = METRICS.register(Counter("spam_submissions_total", "Contact submissions screened as spam, by reason", ("reason",)))
+IDEMPOTENT_REPLAYS = METRICS.register(Counter("idempotent_replays_total", "Contact form retries answered with the stored response"))
+SESSION_CHECKS = METRICS.register(Counter("admin_session_checks_total", "Admin session revocation checks that reached MongoDB"))
+HEALTH_PROBE_UP = METRICS.register(Gauge("health_probe_up", "Whether the last background probe succeeded, by component", ("component",)))
+HEALTH_PROBE_DURATION = METRICS.register(Histogram("health_probe_duration_seconds", "Background health probe latency by component", ("component",)))
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """pymongo command listener that records command latency and failures"""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1_000_000
+        MONGO_DURATION.observe(seconds, (event.command_name,))
+        record_phase("db", seconds)
+        # getMore waits on tailing cursors such as change streams, so it says nothing about load
+        if event.command_name != "getMore":
+            observe_mongo_latency(seconds)
+    
+    def failed(self, event):
+        seconds = event.duration_micros / 1_000_000
+        MONGO_DURATION.observe(seconds, (event.command_name,))
+        MONGO_FAILURES.inc((event.command_name,))
+        record_phase("db", seconds)
+        if event.command_name != "getMore":
+            observe_mongo_latency(seconds)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware that records per-route metrics, Server-Timing phases, request IDs and slow requests"""
+    
+    def __init__(self, app, server_timing=True, slow_threshold_ms=1000):
+        self.app = app
+        self.server_timing = server_timing
+        self.slow_threshold = slow_threshold_ms / 1000
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        event_stream = False
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        
+        # Reuse the caller's request ID so log lines can be correlated across services
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value[:64].decode("latin-1")
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        request_id_token = request_id_var.set(request_id)
+        
+        async def send_with_status(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                event_stream = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+                headers = [(b"x-request-id", request_id.encode("latin-1"))]
+                if self.server_timing:
+                    headers.append((b"server-timing", timings.server_timing(time.perf_counter() - timings.start).encode("latin-1")))
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+        
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - timings.start
+            HTTP_IN_FLIGHT.dec()
+            request_timings.reset(token)
+            
+            # Label by route template (or mount path) to keep cardinality bounded
+            route = scope.get("route")
+            route_path = route.path if route is not None else (scope.get("root_path") or "unmatched")
+            HTTP_REQUESTS.inc((scope["method"], route_path, status))
+            HTTP_DURATION.observe(elapsed, (scope["method"], route_path))
+            
+            # Event streams stay open by design
+            if elapsed >= self.slow_threshold and not event_stream:
+                slow_request_logger.warning(
+                    "Slow request %s %s took %.1fms", scope["method"], scope["path"], elapsed * 1000,
+                    extra={"fields": {
+                        "event": "slow_request",
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": route_path,
+                        "status": status,
+                        "duration_ms": round(elapsed * 1000, 1),
+                        "phases_ms": {phase: round(seconds * 1000, 1) for phase, seconds in timings.phases.items()}
+                    }}
+                )
+            request_id_var.reset(request_id_token)
+
+# Outermost, so the timing covers compression and header handling
+app.add_middleware(
+    MetricsMiddleware,
+    server_timing=SERVER_TIMING_ENABLED,
+    slow_threshold_ms=SLOW_REQUEST_THRESHOLD_MS
+)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    LOG_QUEUE_DEPTH.set(log_queue.qsize())
+    MONGO_LATENCY.set(round(mongo_latency_ewma, 6))
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ============================================================================
+# LOGGING
+# ============================================================================
+
+def parse_sample_rates(value):
+    """Parse 'logger=rate,logger=rate' into a dict of sampling rates"""
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+class StructuredFormatter(logging.Formatter):
+    """Format records as JSON lines, or as text with any structured fields appended"""
+    
+    def __init__(self, json_output=True):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+        self.json_output = json_output
+    
+    def format(self, record):
+        fields = getattr(record, "fields", None)
+        if not self.json_output:
+            text = super().format(record)
+            return f"{text} {orjson.dumps(fields, default=str).decode()}" if fields else text
+        
+        entry = {
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of below-WARNING records from chatty loggers"""
+    
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.resolved = {}
+    
+    def rate_for(self, logger_name):
+        rate = self.resolved.get(logger_name)
+        if rate is None:
+            # Longest configured prefix wins
+            matches = [name for name in self.rates if logger_name == name or logger_name.startswith(name + ".")]
+            rate = self.resolved[logger_name] = self.rates[max(matches, key=len)] if matches else 1.0
+        return rate
+    
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        LOG_RECORDS_SAMPLED_OUT.inc((record.name,))
+        return False
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler that defers formatting to the listener thread and drops records when the queue is full"""
+    
+    def prepare(self, record):
+        # Capture request context now; message formatting happens in the listener thread
+        record.request_id = request_id_var.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            LOG_RECORDS.inc((record.levelname,))
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+log_queue = None
+log_listener = None
+
+def setup_logging():
+    """Route all logging through a bounded queue drained by a background listener thread"""
+    global log_queue, log_listener
+    
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(StructuredFormatter(json_output=LOG_FORMAT == "json"))
+    
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+    
+    root_logger = logging.getLogger()
+    root_logger.handlers = [queue_handler]
+    root_logger.setLevel(LOG_LEVEL)
+    
+    log_listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    log_listener.start()
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+setup_logging()
+atexit.register(stop_logging)
+
+# ============================================================================
+# QUERY AUDIT
+# ============================================================================
+
+AUDITED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Command fields that explain does not accept
+EXPLAIN_EXCLUDED_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+# Slow commands (most recent last) and every query shape seen, keyed by shape
+slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+query_shapes = {}
+explain_queue = queue.Queue(maxsize=100)
+explain_worker = None
+
+def query_shape(value):
+    """Replace literal values in a filter with '?' while keeping fields and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+def command_filter_and_sort(command_name, command):
+    """Extract the filter and sort of an audited command"""
+    if command_name == "find":
+        return command.get("filter", {}), command.get("sort")
+    if command_name in ("count", "distinct"):
+        return command.get("query", {}), None
+    if command_name == "findAndModify":
+        return command.get("query", {}), command.get("sort")
+    if command_name == "update":
+        updates = command.get("updates") or [{}]
+        return updates[0].get("q", {}), None
+    if command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        return deletes[0].get("q", {}), None
+    
+    # aggregate: the leading $match and $sort stages drive index selection
+    query_filter, sort = {}, None
+    for stage in command.get("pipeline", []):
+        if "$match" in stage and not query_filter and sort is None:
+            query_filter = stage["$match"]
+        elif "$sort" in stage and sort is None:
+            sort = stage["$sort"]
+        else:
+            break
+    return query_filter, sort
+
+def suggest_index(filter_shape, sort):
+    """Suggest an index following the equality, sort, range ordering"""
+    equality, ranges = [], []
+    for field, condition in filter_shape.items():
+        if field.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(key in ("$gt", "$gte", "$lt", "$lte", "$ne", "$nin") for key in condition):
+            ranges.append(field)
+        else:
+            equality.append(field)
+    
+    keys = [(field, 1) for field in equality]
+    keys += [(field, direction) for field, direction in (sort or {}).items() if field not in equality]
+    keys += [(field, 1) for field in ranges if field not in dict(keys)]
+    return dict(keys) or None
+
+def plan_summary(explain_result):
+    """Collect the stages and indexes of every winning plan in an explain result"""
+    stages, indexes = [], []
+    
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.append(node["stage"])
+                if node.get("indexName"):
+                    indexes.append(node["indexName"])
+            for key, child in node.items():
+                walk(child, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for child in node:
+                walk(child, in_plan)
+    
+    walk(explain_result, False)
+    flags = []
+    if "COLLSCAN" in stages:
+        flags.append("COLLSCAN")
+    if "SORT" in stages:
+        flags.append("IN_MEMORY_SORT")
+    return {"stages": stages, "indexes": sorted(set(indexes)), "flags": flags}
+
+def run_explain_worker():
+    """Background thread that explains newly seen query shapes"""
+    while True:
+        shape_key, database_name, command = explain_queue.get()
+        try:
+            if mongodb_client is None:
+                continue
+            result = mongodb_client[database_name].command({"explain": command, "verbosity": "queryPlanner"})
+            query_shapes[shape_key]["plan"] = {
+                **plan_summary(result),
+                "explained_at": datetime.utcnow()
+            }
+            if query_shapes[shape_key]["plan"]["flags"]:
+                logger.warning(
+                    "Query plan for %s uses %s, suggested index: %s",
+                    shape_key, ", ".join(query_shapes[shape_key]["plan"]["flags"]), query_shapes[shape_key]["suggested_index"]
+                )
+        except Exception as e:
+            query_shapes[shape_key]["plan"] = {"error": str(e), "explained_at": datetime.utcnow()}
+        finally:
+            explain_queue.task_done()
+
+def schedule_explain(shape_key, database_name, command):
+    """Queue a command for a background explain without blocking the caller"""
+    global explain_worker
+    if explain_worker is None:
+        explain_worker = threading.Thread(target=run_explain_worker, name="query-audit-explain", daemon=True)
+        explain_worker.start()
+    try:
+        explain_queue.put_nowait((shape_key, database_name, command))
+    except queue.Full:
+        query_shapes[shape_key]["plan"] = None
+
+class QueryAuditListener(monitoring.CommandListener):
+    """pymongo command listener that logs slow commands and explains new query shapes"""
+    
+    def __init__(self, threshold_ms=100):
+        self.threshold = threshold_ms * 1000
+        self.pending = {}
+    
+    def started(self, event):
+        if event.command_name not in AUDITED_COMMANDS:
+            return
+        
+        command = event.command
+        collection_name = command.get(event.command_name)
+        query_filter, sort = command_filter_and_sort(event.command_name, command)
+        filter_shape = query_shape(query_filter)
+        shape_key = f"{event.database_name}.{collection_name} {event.command_name} " + orjson.dumps(
+            {"filter": filter_shape, "sort": sort}, option=orjson.OPT_SORT_KEYS, default=bson_default
+        ).decode()
+        
+        shape = query_shapes.get(shape_key)
+        if shape is None:
+            shape = query_shapes[shape_key] = {
+                "collection": collection_name,
+                "command": event.command_name,
+                "filter": filter_shape,
+                "sort": sort,
+                "suggested_index": suggest_index(filter_shape, sort),
+                "count": 0,
+                "slow_count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "first_seen": datetime.utcnow(),
+                "plan": None
+            }
+            explain_command = {
+                key: value for key, value in command.items()
+                if not key.startswith("$") and key not in EXPLAIN_EXCLUDED_FIELDS
+            }
+            for statements in ("updates", "deletes"):
+                if statements in explain_command:
+                    explain_command[statements] = explain_command[statements][:1]
+            schedule_explain(shape_key, event.database_name, explain_command)
+        
+        self.pending[(event.connection_id, event.request_id)] = shape_key
+    
+    def succeeded(self, event):
+        self.finish(event)
+    
+    def failed(self, event):
+        self.finish(event)
+    
+    def finish(self, event):
+        shape_key = self.pending.pop((event.connection_id, event.request_id), None)
+        if shape_key is None:
+            return
+        
+        shape = query_shapes[shape_key]
+        duration_ms = event.duration_micros / 1000
+        shape["count"] += 1
+        shape["total_ms"] += duration_ms
+        shape["max_ms"] = max(shape["max_ms"], duration_ms)
+        
+        if event.duration_micros >= self.threshold:
+            shape["slow_count"] += 1
+            slow_queries.append({
+                "timestamp": datetime.utcnow(),
+                "collection": shape["collection"],
+                "command": shape["command"],
+                "filter": shape["filter"],
+                "sort": shape["sort"],
+                "duration_ms": round(duration_ms, 1)
+            })
+            logger.warning("Slow MongoDB %s on %s took %.1fms: %s", shape['command'], shape['collection'], duration_ms, shape['filter'])
+
+# ============================================================================
+# HEALTH MONITOR
+# ============================================================================
+
+def new_component_health():
+    return {
+        "status": "unknown",
+        "latency_ms": None,
+        "checked_at": None,
+        "last_success_at": None,
+        "consecutive_failures": 0,
+        "error": None,
+        "history": deque(maxlen=HEALTH_HISTORY_SIZE)
+    }
+
+# Rolling probe results served by /health without touching the backends
+health_status = {
+    "mongodb": new_component_health(),
+    "resend": new_component_health()
+}
+health_tasks = []
+
+def record_probe(component, status, latency, error=None):
+    """Store the result of one probe in the rolling health status"""
+    state = health_status[component]
+    now = datetime.utcnow()
+    state["status"] = status
+    state["latency_ms"] = round(latency * 1000, 1) if latency is not None else None
+    state["checked_at"] = now
+    state["error"] = error
+    if status == "up":
+        state["last_success_at"] = now
+        state["consecutive_failures"] = 0
+    elif status == "down":
+        state["consecutive_failures"] += 1
+    state["history"].append((status, state["latency_ms"]))
+    
+    HEALTH_PROBE_UP.set(1 if status == "up" else 0, (component,))
+    if latency is not None:
+        HEALTH_PROBE_DURATION.observe(latency, (component,))
+
+def ping_mongodb():
+    mongodb_client.admin.command("ping")
+
+def check_resend():
+    try:
+        resend.Domains.list()
+    except (resend.exceptions.MissingApiKeyError, resend.exceptions.InvalidApiKeyError):
+        raise
+    except resend.exceptions.ResendError as e:
+        # Sending-only keys may not list domains, but the API answered and accepted the key
+        if str(e.code).isdigit() and int(e.code) >= 500:
+            raise
+
+async def probe(component, check):
+    """Run a blocking check in a worker thread with a timeout and record the outcome"""
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(asyncio.to_thread(check), timeout=HEALTH_PROBE_TIMEOUT)
+        record_probe(component, "up", time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        record_probe(component, "down", time.perf_counter() - start, f"Timed out after {HEALTH_PROBE_TIMEOUT}s")
+    except Exception as e:
+        record_probe(component, "down", time.perf_counter() - start, str(e))
+
+async def run_health_probe(component, check, interval, enabled):
+    """Probe one dependency forever on a fixed interval"""
+    while True:
+        if enabled():
+            await probe(component, check)
+        else:
+            record_probe(component, "disconnected", None)
+        await asyncio.sleep(interval)
+
+def start_health_monitor():
+    """Start the background probes for MongoDB and Resend"""
+    health_tasks.append(asyncio.create_task(run_health_probe(
+        "mongodb", ping_mongodb, HEALTH_CHECK_INTERVAL,
+        lambda: mongodb_client is not None and is_db_connected
+    )))
+    health_tasks.append(asyncio.create_task(run_health_probe(
+        "resend", check_resend, RESEND_HEALTH_CHECK_INTERVAL,
+        lambda: bool(RESEND_API_KEY)
+    )))
+
+async def stop_health_monitor():
+    for task in health_tasks:
+        task.cancel()
+    await asyncio.gather(*health_tasks, return_exceptions=True)
+    health_tasks.clear()
+
+def component_summary(component):
+    """Public view of one component's rolling health"""
+    state = health_status[component]
+    history = state["history"]
+    latencies = [latency for _, latency in history if latency is not None]
+    return {
+        "status": state["status"],
+        "latency_ms": state["latency_ms"],
+        "checked_at": state["checked_at"],
+        "last_success_at": state["last_success_at"],
+        "consecutive_failures": state["consecutive_failures"],
+        "error": state["error"],
+        "window": {
+            "probes": len(history),
+            "up_ratio": round(sum(1 for status, _ in history if status == "up") / len(history), 3) if history else None,
+            "avg_latency_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "max_latency_ms": max(latencies) if latencies else None
+        }
+    }
+
+def is_ready():
+    """Ready when startup tasks finished, MongoDB is connected and its last probe succeeded recently"""
+    state = health_status["mongodb"]
+    if startup_state["status"] != "complete" or not is_db_connected or state["status"] != "up":
+        return False
+    age = (datetime.utcnow() - state["checked_at"]).total_seconds()
+    return age <= HEALTH_CHECK_INTERVAL * 3 + HEALTH_PROBE_TIMEOUT
+
+# ============================================================================
+# SOFT DELETE AND PURGE
+# ============================================================================
+
+# Deleted documents carry deleted_at and purge_after until the purge worker removes them
+NOT_DELETED = {"deleted_at": None}
+# Restores stop this long before purge_after, so a purge that already picked an item up never races a restore
+PURGE_CLOCK_MARGIN = 60
+
+def purge_deadline(now):
+    return now + timedelta(seconds=PURGE_GRACE_PERIOD)
+
+def restorable_until(now):
+    """Deleted items whose purge_after is later than this can still be restored"""
+    return now + timedelta(seconds=PURGE_CLOCK_MARGIN)
+
+def trashed_image(url, now):
+    """Entry for an uploaded gallery file that is no longer the image's current one"""
+    return {"key": url.replace("/images/", ""), "url": url, "deleted_at": now, "purge_after": purge_deadline(now)}
+
+def purge_deleted():
+    """Remove the files, then the documents, of deletions past their grace period; returns whether a batch was full"""
+    now = datetime.utcnow()
+    expired = {"purge_after": {"$lte": now}}
+    
+    # Files go first: after a crash in between, the still hidden document is picked up again on the next pass
+    submissions = list(collection.find(expired, {"uploaded_files.saved_name": 1}).limit(PURGE_BATCH_SIZE))
+    if submissions:
+        files = attachment_storage.delete_many([
+            file_info["saved_name"] for doc in submissions for file_info in doc.get("uploaded_files", [])
+        ])
+        collection.delete_many({"_id": {"$in": [doc["_id"] for doc in submissions]}, **expired})
+        PURGED.inc(("submission",), len(submissions))
+        PURGED.inc(("attachment",), files)
+    
+    images = list(gallery_collection.find(expired, {"current_url": 1, "trashed_files.key": 1}).limit(PURGE_BATCH_SIZE))
+    if images:
+        files = image_storage.delete_many(
+            [doc["current_url"].replace("/images/", "") for doc in images if doc.get("current_url", "").startswith("/images/")] +
+            [entry["key"] for doc in images for entry in doc.get("trashed_files", [])]
+        )
+        gallery_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in images]}, **expired})
+        PURGED.inc(("gallery_image",), len(images))
+        PURGED.inc(("image_file",), files)
+    
+    trashed = list(gallery_collection.find({"trashed_files.purge_after": {"$lte": now}}, {"trashed_files": 1}).limit(PURGE_BATCH_SIZE))
+    for doc in trashed:
+        keys = [entry["key"] for entry in doc["trashed_files"] if entry["purge_after"] <= now]
+        PURGED.inc(("image_file",), image_storage.delete_many(keys))
+        gallery_collection.update_one({"_id": doc["_id"]}, {"$pull": {"trashed_files": {"key": {"$in": keys}}}})
+    
+    if submissions or images or trashed:
+        logger.info("Purged %s submissions, %s gallery images and %s replaced gallery uploads", len(submissions), len(images), len(trashed))
+    return max(len(submissions), len(images), len(trashed)) >= PURGE_BATCH_SIZE
+
+async def run_purge():
+    """Purge expired deletions on the leader every PURGE_INTERVAL, and straight away while batches come back full"""
+    while True:
+        full = False
+        if is_db_connected and is_leader:
+            try:
+                full = await asyncio.to_thread(purge_deleted)
+            except Exception as e:
+                logger.warning("Purge of deleted items failed: %s", e)
+        await asyncio.sleep(0 if full else PURGE_INTERVAL)
+
+# ============================================================================
+# MULTI-WORKER SUPPORT
+# ============================================================================
+
+LEADER_LEASE_ID = "leader_lease"
+GALLERY_VERSION_ID = "gallery_version"
+
+def new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Identifies this process in the leader lease; a single process always leads
+worker_id = new_worker_id()
+is_leader = not MULTI_WORKER_MODE
+worker_tasks = []
+shared_gallery_version = None
+
+def acquire_leader_lease():
+    """Take or renew the leader lease; returns whether this worker holds it"""
+    global is_leader
+    now = datetime.utcnow()
+    try:
+        lease = metadata_collection.find_one_and_update(
+            {"_id": LEADER_LEASE_ID, "$or": [{"holder": worker_id}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": worker_id, "expires_at": now + timedelta(seconds=LEADER_LEASE_TTL), "renewed_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        leading = lease["holder"] == worker_id
+    except DuplicateKeyError:
+        # Another worker holds an unexpired lease, so the upsert collided with its document
+        leading = False
+    
+    if leading != is_leader:
+        logger.info("Worker %s %s the leader lease", worker_id, 'acquired' if leading else 'lost')
+    is_leader = leading
+    LEADER.set(1 if leading else 0)
+    return leading
+
+def release_leader_lease():
+    """Give up the lease on shutdown so another worker can take over without waiting for expiry"""
+    global is_leader
+    if is_leader and metadata_collection is not None:
+        metadata_collection.delete_one({"_id": LEADER_LEASE_ID, "holder": worker_id})
+    is_leader = False
+
+async def run_leader_lease():
+    """Renew (or contend for) the leader lease every third of its TTL"""
+    global is_leader
+    while True:
+        if is_db_connected:
+            try:
+                await asyncio.to_thread(acquire_leader_lease)
+            except PyMongoError as e:
+                logger.warning("Leader lease renewal failed: %s", e)
+                is_leader = False
+                LEADER.set(0)
+        await asyncio.sleep(LEADER_LEASE_TTL / 3)
+
+def bump_shared_gallery_version():
+    """Tell the other workers that the gallery changed"""
+    global shared_gallery_version
+    try:
+        marker = metadata_collection.find_one_and_update(
+            {"_id": GALLERY_VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        shared_gallery_version = marker["version"]
+    except PyMongoError as e:
+        logger.warning("Could not publish gallery change to other workers: %s", e)
+
+async def run_gallery_sync():
+    """Drop the local gallery snapshot when another worker has changed the gallery"""
+    global shared_gallery_version
+    while True:
+        if is_db_connected:
+            try:
+                marker = await asyncio.to_thread(metadata_collection.find_one, {"_id": GALLERY_VERSION_ID})
+                version = (marker or {}).get("version", 0)
+                if shared_gallery_version is not None and version != shared_gallery_version:
+                    drop_gallery_snapshot()
+                shared_gallery_version = version
+            except PyMongoError as e:
+                logger.warning("Gallery sync failed: %s", e)
+        await asyncio.sleep(GALLERY_SYNC_INTERVAL)
+
+def start_worker_tasks():
+    """Start the purge worker and, when running several workers, the per-worker coordination tasks"""
+    global shared_events_thread
+    worker_tasks.append(asyncio.create_task(run_purge()))
+    if not MULTI_WORKER_MODE:
+        LEADER.set(1)
+        return
+    worker_tasks.append(asyncio.create_task(run_leader_lease()))
+    worker_tasks.append(asyncio.create_task(run_gallery_sync()))
+    # The change stream blocks for the life of the process, so it gets its own thread rather than an executor slot
+    shared_events_stop.clear()
+    shared_events_thread = threading.Thread(
+        target=watch_shared_events, args=(asyncio.get_running_loop(),), name="shared-events", daemon=True
+    )
+    shared_events_thread.start()
+
+async def stop_worker_tasks():
+    global shared_events_thread
+    shared_events_stop.set()
+    stream = shared_events_stream
+    if stream is not None:
+        # Wakes the watcher out of its wait for the next change
+        try:
+            stream.close()
+        except PyMongoError:
+            pass
+    for task in worker_tasks:
+        task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    worker_tasks.clear()
+    if shared_events_thread is not None:
+        await asyncio.to_thread(shared_events_thread.join, 5)
+        shared_events_thread = None
+    if MULTI_WORKER_MODE and is_db_connected:
+        try:
+            await asyncio.to_thread(release_leader_lease)
+        except PyMongoError as e:
+            logger.warning("Could not release leader lease: %s", e)
+
+def reinitialize_after_fork():
+    """Reset per-process state in a forked worker: threads and MongoDB clients do not survive fork"""
+    global mongodb_client, is_db_connected, explain_worker, explain_queue, worker_id, is_leader, storage_executor
+    global shared_events_thread, shared_events_stream
+    # The parent's client owns the sockets; the worker creates its own in lifespan
+    mongodb_client = None
+    is_db_connected = False
+    explain_worker = None
+    explain_queue = queue.Queue(maxsize=100)
+    worker_id = new_worker_id()
+    is_leader = not MULTI_WORKER_MODE
+    storage_executor = new_storage_executor()
+    shared_events_thread = None
+    shared_events_stream = None
+    drop_gallery_snapshot()
+    setup_logging()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reinitialize_after_fork)
 
 # Health check endpoint
 @app.get("/")
@@ -431,43 +2501,161 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check endpoint"""
+    """Detailed health check endpoint, served from the background health monitor"""
+    mongodb_health = component_summary("mongodb")
+    
+    if mongodb_health["status"] == "down":
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "unhealthy",
+                "database": "error",
+                "error": mongodb_health["error"],
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        )
+    
+    return {
+        "status": "healthy",
+        "database": "connected" if mongodb_client and is_db_connected else "disconnected",
+        "timestamp": datetime.utcnow().isoformat(),
+        "mongodb_configured": MONGODB_CONNECTION_STRING is not None,
+        "resend_configured": RESEND_API_KEY is not None,
+        "email_setup": {
+            "admin_email": ADMIN_EMAIL,
+            "company_email": COMPANY_EMAIL,
+            "dual_notifications": True
+        },
+        "checks": {
+            "mongodb": mongodb_health,
+            "resend": component_summary("resend")
+        },
+        "startup": startup_state,
+        "worker": {"id": worker_id, "leader": is_leader}
+    }
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: startup tasks finished and MongoDB answered its last ping"""
+    ready = is_ready()
+    content = {
+        "status": "ready" if ready else "not_ready",
+        "database": health_status["mongodb"]["status"],
+        "startup": startup_state["status"],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if not ready:
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+# ============================================================================
+# ADMIN SESSIONS
+# ============================================================================
+
+# Sessions whose revocation was checked recently: session ID -> (checked at, token expiry)
+session_cache = {}
+MAX_CACHED_SESSIONS = 1000
+
+def sign_session(payload):
+    return base64.urlsafe_b64encode(hmac.new(SESSION_SIGNING_KEY, payload, hashlib.sha256).digest()).rstrip(b"=").decode()
+
+def issue_session_token(admin):
+    """Record a new session for the admin and return its signed bearer token and expiry"""
+    session_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ADMIN_SESSION_TTL)
+    sessions_collection.insert_one({
+        "_id": session_id,
+        "admin_id": admin["_id"],
+        "created_at": now,
+        "expires_at": expires_at,
+        "revoked": False
+    })
+    payload = base64.urlsafe_b64encode(orjson.dumps({
+        "sid": session_id,
+        "sub": str(admin["_id"]),
+        "exp": int(expires_at.replace(tzinfo=timezone.utc).timestamp())
+    })).rstrip(b"=")
+    return f"{payload.decode()}.{sign_session(payload)}", expires_at
+
+def decode_session_token(token):
+    """Return the claims of a correctly signed, unexpired token, or None"""
+    payload, _, signature = token.partition(".")
+    # Compared as bytes: compare_digest rejects str with non-ASCII characters, which a client can send
+    if not hmac.compare_digest(sign_session(payload.encode()).encode(), signature.encode()):
+        return None
     try:
-        # Test MongoDB connection
-        if mongodb_client and is_db_connected:
-            mongodb_client.admin.command('ping')
-            db_status = "connected"
+        claims = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+def revoke_sessions(query_filter):
+    """Revoke matching sessions; other workers notice within SESSION_CHECK_INTERVAL"""
+    revoked = [doc["_id"] for doc in sessions_collection.find({**query_filter, "revoked": False}, {"_id": 1})]
+    if revoked:
+        sessions_collection.update_many({"_id": {"$in": revoked}}, {"$set": {"revoked": True}})
+    for session_id in revoked:
+        session_cache.pop(session_id, None)
+    return len(revoked)
+
+async def require_admin(request: Request):
+    """Authenticate an admin request from its bearer token; returns the session claims.
+    
+    The signature and expiry are checked in memory. Revocation is checked against
+    MongoDB at most once per SESSION_CHECK_INTERVAL per session, so most admin
+    requests touch no database at all.
+    """
+    if not ADMIN_AUTH_REQUIRED:
+        return None
+    
+    token = None
+    authorization = request.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        token = authorization[7:].strip()
+    elif "text/event-stream" in request.headers.get("accept", ""):
+        # EventSource cannot set headers, so event streams may pass the token in the URL
+        token = request.query_params.get("access_token")
+    
+    claims = decode_session_token(token) if token else None
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Authentication required", headers={"WWW-Authenticate": "Bearer"})
+    
+    session_id = claims["sid"]
+    cached = session_cache.get(session_id)
+    if cached is None or time.monotonic() - cached[0] >= SESSION_CHECK_INTERVAL:
+        if not is_db_connected or sessions_collection is None:
+            if cached is None:
+                raise HTTPException(status_code=503, detail="Database connection not available")
         else:
-            db_status = "disconnected"
-        
-        return {
-            "status": "healthy",
-            "database": db_status,
-            "timestamp": datetime.utcnow().isoformat(),
-            "mongodb_configured": MONGODB_CONNECTION_STRING is not None,
-            "resend_configured": RESEND_API_KEY is not None,
-            "email_setup": {
-                "admin_email": ADMIN_EMAIL,
-                "company_email": COMPANY_EMAIL,
-                "dual_notifications": True
-            }
-        }
-    except Exception as e:
-        return JSONResponse(
-            status_code=503,
-            content={
-                "status": "unhealthy",
-                "database": "error",
-                "error": str(e),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
+            SESSION_CHECKS.inc()
+            session = sessions_collection.find_one(
+                {"_id": session_id, "revoked": False, "expires_at": {"$gt": datetime.utcnow()}},
+                {"_id": 1}
+            )
+            if session is None:
+                session_cache.pop(session_id, None)
+                raise HTTPException(status_code=401, detail="Session expired or revoked", headers={"WWW-Authenticate": "Bearer"})
+            if len(session_cache) >= MAX_CACHED_SESSIONS:
+                now = time.time()
+                for expired in [key for key, (_, expires) in session_cache.items() if expires <= now]:
+                    del session_cache[expired]
+            session_cache[session_id] = (time.monotonic(), claims["exp"])
+    
+    return claims
 
 # ============================================================================
 # ADMIN PROFILE ENDPOINTS
 # ============================================================================
 
-@app.get("/api/admin/profile")
+@app.get("/api/admin/profile", dependencies=[Depends(require_admin)])
 async def get_admin_profile():
     """Get admin profile information"""
     try:
@@ -477,38 +2665,33 @@ async def get_admin_profile():
                 detail="Database connection not available"
             )
         
-        # Get the first (and should be only) admin user
-        admin = admin_collection.find_one({})
+        # Get the first (and should be only) admin user, without sensitive data
+        admin = admin_collection.find_one(
+            {},
+            {"_id": 0, "name": 1, "email": 1, "created_at": 1, "updated_at": 1}
+        )
         if not admin:
             raise HTTPException(
                 status_code=404,
                 detail="Admin profile not found"
             )
         
-        # Remove sensitive data
-        admin_data = {
-            "name": admin.get("name", ""),
-            "email": admin.get("email", ""),
-            "created_at": admin.get("created_at", "").isoformat() if admin.get("created_at") else "",
-            "updated_at": admin.get("updated_at", "").isoformat() if admin.get("updated_at") else ""
-        }
-        
-        return {
+        return BSONResponse({
             "success": True,
-            "admin": admin_data
-        }
+            "admin": {"name": "", "email": "", "created_at": "", "updated_at": "", **admin}
+        })
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching admin profile: {e}")
+        logger.error("Error fetching admin profile: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to fetch admin profile"
         )
 
 @app.put("/api/admin/profile")
-async def update_admin_profile(request: Request):
+async def update_admin_profile(request: Request, session=Depends(require_admin)):
     """Update admin profile information"""
     try:
         if not is_db_connected or admin_collection is None:
@@ -561,14 +2744,14 @@ async def update_admin_profile(request: Request):
                 )
             
             # Verify current password
-            if not verify_password(current_password, admin.get("password", "")):
+            if not await asyncio.to_thread(verify_password, current_password, admin.get("password", "")):
                 raise HTTPException(
                     status_code=400,
                     detail="Current password is incorrect"
                 )
             
             # Add new password to update data
-            update_data["password"] = hash_password(new_password)
+            update_data["password"] = await asyncio.to_thread(hash_password, new_password)
         
         # Update admin profile
         result = admin_collection.update_one(
@@ -589,7 +2772,13 @@ async def update_admin_profile(request: Request):
             "updated_at": update_data["updated_at"].isoformat()
         }
         
-        logger.info(f"Admin profile updated successfully")
+        # A new password signs out every other session of this admin
+        if new_password:
+            current_session = {"_id": {"$ne": session["sid"]}} if session else {}
+            revoked = revoke_sessions({"admin_id": admin["_id"], **current_session})
+            logger.info("Revoked %s admin sessions after password change", revoked)
+        
+        logger.info("Admin profile updated successfully")
         
         return {
             "success": True,
@@ -600,7 +2789,7 @@ async def update_admin_profile(request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating admin profile: {e}")
+        logger.error("Error updating admin profile: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to update admin profile"
@@ -628,44 +2817,145 @@ async def admin_login(request: Request):
         
         # Find admin by email
         admin = admin_collection.find_one({"email": email})
-        if not admin:
+        
+        # Verify password off the event loop; unknown emails cost the same as wrong passwords
+        stored_password = admin.get("password", "") if admin else DUMMY_PASSWORD_HASH
+        if not await asyncio.to_thread(verify_password, password, stored_password) or not admin:
             raise HTTPException(
                 status_code=401,
                 detail="Invalid email or password"
             )
         
-        # Verify password
-        if not verify_password(password, admin.get("password", "")):
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid email or password"
+        # Upgrade legacy SHA-256 or weaker scrypt hashes now that the password is known
+        if password_needs_rehash(stored_password):
+            admin_collection.update_one(
+                {"_id": admin["_id"]},
+                {"$set": {"password": await asyncio.to_thread(hash_password, password)}}
             )
         
-        # Return success (in a real app, you'd return a JWT token)
-        return {
+        token, expires_at = issue_session_token(admin)
+        
+        return BSONResponse({
             "success": True,
             "message": "Login successful",
+            "token": token,
+            "expires_at": expires_at,
             "admin": {
                 "name": admin.get("name", ""),
                 "email": admin.get("email", "")
             }
-        }
+        })
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error during admin login: {e}")
+        logger.error("Error during admin login: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Login failed"
         )
 
+@app.post("/api/admin/logout")
+async def admin_logout(session=Depends(require_admin)):
+    """Revoke the current session token"""
+    if session is not None and is_db_connected:
+        revoke_sessions({"_id": session["sid"]})
+    return {"success": True, "message": "Logged out"}
+
+@app.get("/api/admin/query-audit", dependencies=[Depends(require_admin)])
+async def get_query_audit(limit: int = 50):
+    """Report slow MongoDB commands and query shapes whose plans need an index"""
+    shapes = []
+    for shape_key, shape in list(query_shapes.items()):
+        plan = shape.get("plan") or {}
+        shapes.append({
+            "shape": shape_key,
+            **shape,
+            "avg_ms": round(shape["total_ms"] / shape["count"], 2) if shape["count"] else 0.0,
+            "needs_index": bool(plan.get("flags"))
+        })
+    
+    # Shapes that need an index first, then the most expensive ones
+    shapes.sort(key=lambda item: (not item["needs_index"], -item["total_ms"]))
+    
+    return {
+        "success": True,
+        "enabled": QUERY_AUDIT_ENABLED,
+        "slow_query_threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "summary": {
+            "shapes_seen": len(shapes),
+            "shapes_needing_index": sum(1 for item in shapes if item["needs_index"]),
+            "shapes_pending_explain": sum(1 for item in shapes if item["plan"] is None),
+            "slow_queries_logged": len(slow_queries)
+        },
+        "query_shapes": shapes,
+        "slow_queries": list(slow_queries)[-limit:][::-1]
+    }
+
 # ============================================================================
 # FILE UPLOAD AND SERVING ENDPOINTS
 # ============================================================================
 
-@app.get("/api/submissions/{submission_id}/file/{filename}")
-async def download_file(submission_id: str, filename: str):
+def sign_attachment(key, name, content_type, expires):
+    message = "\n".join((key, name, content_type, str(expires))).encode()
+    digest = hmac.new(URL_SIGNING_KEY, message, hashlib.sha256).digest()[:20]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def signed_attachment_url(file_info, expires, base_url=""):
+    """Download URL for an attachment that is valid until expires (unix time) without a database lookup"""
+    key = file_info["saved_name"]
+    name = file_info.get("original_name", key)
+    content_type = file_info.get("content_type", "application/octet-stream")
+    query = urlencode({
+        "name": name,
+        "type": content_type,
+        "expires": expires,
+        "sig": sign_attachment(key, name, content_type, expires)
+    })
+    return f"{base_url}/files/{quote(key)}?{query}"
+
+def signed_url_expiry(ttl):
+    # Rounded up to 5 minutes so repeated listings hand out the same, cacheable URLs
+    return (int(time.time()) // 300 + 1) * 300 + ttl
+
+def with_download_urls(documents, base_url):
+    """Add a signed download_url to every attachment of each submission"""
+    expires = signed_url_expiry(SIGNED_URL_TTL)
+    for doc in documents:
+        for file_info in doc.get("uploaded_files") or ():
+            if file_info.get("saved_name"):
+                file_info["download_url"] = signed_attachment_url(file_info, expires, base_url)
+        yield doc
+
+@app.get("/files/{key}")
+async def download_signed_file(
+    key: str,
+    request: Request,
+    expires: int,
+    sig: str,
+    name: Optional[str] = None,
+    content_type: str = Query("application/octet-stream", alias="type")
+):
+    """Serve an attachment from storage using a signed URL"""
+    expected = sign_attachment(key, name if name is not None else key, content_type, expires)
+    if not hmac.compare_digest(sig.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid download link")
+    remaining = expires - int(time.time())
+    if remaining <= 0:
+        raise HTTPException(status_code=410, detail="Download link has expired")
+    if not is_db_connected or collection is None:
+        raise HTTPException(status_code=503, detail="Database connection not available")
+    
+    # Links outlive the deletion of their submission, so check it is still live before serving
+    if collection.find_one({"uploaded_files.saved_name": key, **NOT_DELETED}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    response = await storage_response(attachment_storage, key, request, filename=name or key, media_type=content_type)
+    response.headers["Cache-Control"] = f"private, max-age={remaining}"
+    return response
+
+@app.get("/api/submissions/{submission_id}/file/{filename}", dependencies=[Depends(require_admin)])
+async def download_file(submission_id: str, filename: str, request: Request):
     """Download a file attached to a submission"""
     try:
         if not is_db_connected or collection is None:
@@ -674,56 +2964,284 @@ async def download_file(submission_id: str, filename: str):
                 detail="Database connection not available"
             )
         
-        # Verify submission exists and contains this file
-        submission = collection.find_one({"_id": ObjectId(submission_id)})
-        if not submission:
+        # Fetch only the matching attachment entry, not the whole submission
+        submission = collection.find_one(
+            {"_id": ObjectId(submission_id), **NOT_DELETED},
+            {"_id": 0, "uploaded_files": {"$elemMatch": {"saved_name": filename}}}
+        )
+        if submission is None:
             raise HTTPException(
                 status_code=404,
                 detail="Submission not found"
             )
         
-        # Check if file exists in submission
-        uploaded_files = submission.get("uploaded_files", [])
-        file_info = None
-        for file_data in uploaded_files:
-            if file_data.get("saved_name") == filename:
-                file_info = file_data
-                break
-        
-        if not file_info:
+        if not submission.get("uploaded_files"):
             raise HTTPException(
                 status_code=404,
                 detail="File not found in submission"
             )
+        file_info = submission["uploaded_files"][0]
         
-        # Check if physical file exists
-        file_path = UPLOAD_DIR / filename
-        if not file_path.exists():
-            raise HTTPException(
-                status_code=404,
-                detail="Physical file not found"
-            )
-        
-        # Return file
-        return FileResponse(
-            path=file_path,
+        # Stream the file from storage, honouring Range/If-Range with a content-hash ETag
+        return await storage_response(
+            attachment_storage,
+            filename,
+            request,
             filename=file_info.get("original_name", filename),
-            media_type=file_info.get("content_type", "application/octet-stream")
+            media_type=file_info.get("content_type", "application/octet-stream"),
+            etag=content_etag(file_info.get("sha256"))
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error downloading file: {e}")
+        logger.error("Error downloading file: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to download file"
         )
 
+# ============================================================================
+# IDEMPOTENCY KEYS
+# ============================================================================
+
+# Completed responses by idempotency key, most recently used last: key -> (expires at, fingerprint, response)
+idempotency_cache = OrderedDict()
+
+def remember_idempotent_response(key, fingerprint, response, expires_at):
+    idempotency_cache[key] = (expires_at, fingerprint, response)
+    idempotency_cache.move_to_end(key)
+    while len(idempotency_cache) > IDEMPOTENCY_CACHE_SIZE:
+        idempotency_cache.popitem(last=False)
+
+def cached_idempotent_response(key):
+    entry = idempotency_cache.get(key)
+    if entry is not None and entry[0] <= time.time():
+        del idempotency_cache[key]
+        return None
+    return entry
+
+def replay_idempotent_response(fingerprint, entry):
+    if entry[1] != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    IDEMPOTENT_REPLAYS.inc()
+    return JSONResponse(entry[2], headers={"Idempotency-Replayed": "true"})
+
+def stored_submission(key, since):
+    """The submission a claim made at since went on to store, if it got that far"""
+    return collection.find_one(
+        {"idempotency_key": key, "submitted_at": {"$gte": since}},
+        {"submitted_at": 1, "uploaded_files": 1}
+    )
+
+def claim_idempotency_key(key, fingerprint):
+    """Claim a key for processing; returns a stored (expires at, fingerprint, response) if it already completed"""
+    now = datetime.utcnow()
+    claim = {
+        "state": "pending",
+        "fingerprint": fingerprint,
+        "created_at": now,
+        # Kept as long as a response would be, so a retry after a timeout still finds what the claim stored
+        "stale_at": now + timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT),
+        "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL)
+    }
+    try:
+        idempotency_collection.insert_one({"_id": key, **claim})
+        return None
+    except DuplicateKeyError:
+        pass
+    
+    existing = idempotency_collection.find_one({"_id": key}) or {}
+    if existing.get("state") == "completed" and existing["expires_at"] > now:
+        expires_at = existing["expires_at"].replace(tzinfo=timezone.utc).timestamp()
+        return expires_at, existing["fingerprint"], existing["response"]
+    
+    # A stale claim whose submission was stored before its request died must not run again
+    if existing.get("state") == "pending" and existing["stale_at"] < now:
+        submission = stored_submission(key, existing["created_at"])
+        if submission is not None:
+            response = contact_response(submission["_id"], submission["submitted_at"], len(submission.get("uploaded_files") or ()))
+            complete_idempotency_key(key, existing["fingerprint"], response)
+            return time.time() + IDEMPOTENCY_TTL, existing["fingerprint"], response
+    
+    # A claim left behind by a crashed request can be taken over once it times out, and an expired response reused
+    taken = idempotency_collection.update_one(
+        {"_id": key, "$or": [
+            {"state": "pending", "stale_at": {"$lt": now}},
+            {"state": "completed", "expires_at": {"$lte": now}}
+        ]},
+        {"$set": claim, "$unset": {"response": ""}}
+    )
+    if taken.modified_count == 0:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed",
+            headers={"Retry-After": "1"}
+        )
+    return None
+
+def complete_idempotency_key(key, fingerprint, response):
+    remember_idempotent_response(key, fingerprint, response, time.time() + IDEMPOTENCY_TTL)
+    expires_at = datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL)
+    idempotency_collection.update_one(
+        {"_id": key},
+        {"$set": {"state": "completed", "response": response, "expires_at": expires_at}, "$unset": {"stale_at": ""}}
+    )
+
+def release_idempotency_key(key):
+    """Drop a claim whose request failed so the client can retry it, unless its submission was stored"""
+    try:
+        claim = idempotency_collection.find_one({"_id": key, "state": "pending"}, {"created_at": 1})
+        if claim is not None and stored_submission(key, claim["created_at"]) is None:
+            idempotency_collection.delete_one({"_id": key, "state": "pending"})
+    except PyMongoError as e:
+        logger.warning("Could not release idempotency key: %s", e)
+
+# ============================================================================
+# SPAM SCREENING
+# ============================================================================
+
+# MinHash over the message's distinct words; 8 LSH bands of 4 values find messages sharing 80% of their words
+# with about 99% probability, and each candidate is confirmed against the full signature
+MINHASH_PRIME = (1 << 61) - 1
+MINHASH_BAND_ROWS = 4
+MINHASH_MAX_WORDS = 256
+SPAM_SIMILARITY = 0.8
+
+def minhash_permutations(count):
+    # Fixed seed, so every worker computes the same signature for the same message
+    rng = random.Random(48)
+    return [(rng.randrange(1, MINHASH_PRIME), rng.randrange(MINHASH_PRIME)) for _ in range(count)]
+
+MINHASH_PERMUTATIONS = minhash_permutations(32)
+
+def message_signature(message):
+    """MinHash signature of the message's words, or None when the message is too short to compare"""
+    words = re.findall(r"\w+", message.lower())
+    if len(words) < SPAM_MIN_WORDS:
+        return None
+    
+    hashes = {int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "big") for word in words}
+    # Long messages are compared on a consistent sample of their words, which keeps the cost bounded
+    sample = heapq.nsmallest(MINHASH_MAX_WORDS, hashes)
+    return tuple(min((a * h + b) % MINHASH_PRIME for h in sample) for a, b in MINHASH_PERMUTATIONS)
+
+def signature_similarity(first, second):
+    """Estimated share of words two messages have in common"""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+class SpamScreen:
+    """Recent message signatures and per-sender and per-address counters, all on the event loop"""
+    
+    def __init__(self, window, max_entries):
+        self.window = window
+        self.max_entries = max_entries
+        # (seen at, signature) in arrival order, and (band, band values) -> {signature: copies}
+        self.recent = deque()
+        self.bands = {}
+        # ("email" or "ip", value) -> [window start, submissions]
+        self.counters = {}
+    
+    @staticmethod
+    def band_keys(signature):
+        return [(start, signature[start:start + MINHASH_BAND_ROWS]) for start in range(0, len(signature), MINHASH_BAND_ROWS)]
+    
+    def expire(self, now):
+        while self.recent and (self.recent[0][0] <= now - self.window or len(self.recent) > self.max_entries):
+            _, signature = self.recent.popleft()
+            for key in self.band_keys(signature):
+                bucket = self.bands[key]
+                bucket[signature] -= 1
+                if not bucket[signature]:
+                    del bucket[signature]
+                    if not bucket:
+                        del self.bands[key]
+        if len(self.counters) > self.max_entries:
+            for key in [key for key, (started, _) in self.counters.items() if started <= now - self.window]:
+                del self.counters[key]
+    
+    def near_duplicates(self, signature):
+        """Count recent messages that share at least SPAM_SIMILARITY of their words with this one"""
+        matches = {}
+        for key in self.band_keys(signature):
+            for other, copies in self.bands.get(key, {}).items():
+                if other not in matches and signature_similarity(signature, other) >= SPAM_SIMILARITY:
+                    matches[other] = copies
+        return sum(matches.values())
+    
+    def count(self, key, now):
+        """Submissions recorded for key in its current window"""
+        counter = self.counters.get(key)
+        return 0 if counter is None or counter[0] <= now - self.window else counter[1]
+    
+    def check(self, message, email, client):
+        """Return the reasons a submission looks like spam, without recording it"""
+        now = time.monotonic()
+        self.expire(now)
+        reasons = []
+        
+        signature = message_signature(message)
+        if signature is not None and self.near_duplicates(signature) >= SPAM_DUPLICATE_LIMIT:
+            reasons.append("duplicate")
+        if self.count(("email", email.lower()), now) + 1 > SPAM_SENDER_LIMIT:
+            reasons.append("sender_velocity")
+        if self.count(("ip", client), now) + 1 > SPAM_IP_LIMIT:
+            reasons.append("ip_velocity")
+        
+        for reason in reasons:
+            SPAM_SCREENED.inc((reason,))
+        return reasons
+    
+    def record(self, message, email, client):
+        """Remember an accepted submission for later checks"""
+        now = time.monotonic()
+        signature = message_signature(message)
+        if signature is not None:
+            self.recent.append((now, signature))
+            for key in self.band_keys(signature):
+                bucket = self.bands.setdefault(key, {})
+                bucket[signature] = bucket.get(signature, 0) + 1
+        for key in (("email", email.lower()), ("ip", client)):
+            counter = self.counters.get(key)
+            if counter is None or counter[0] <= now - self.window:
+                counter = self.counters[key] = [now, 0]
+            counter[1] += 1
+
+spam_screen = SpamScreen(SPAM_WINDOW, SPAM_INDEX_SIZE)
+
 # ============================================================================
 # CONTACT FORM ENDPOINTS WITH FILE UPLOAD SUPPORT
 # ============================================================================
 
+def send_email(params):
+    """Send one email through Resend, recording latency and failures"""
+    start = time.perf_counter()
+    try:
+        return resend.Emails.send(params)
+    except Exception:
+        RESEND_FAILURES.inc(("send",))
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        RESEND_DURATION.observe(elapsed, ("send",))
+        record_phase("email", elapsed)
+
+def send_email_batch(params_list):
+    """Send up to RESEND_BATCH_SIZE emails in one Resend batch call, recording latency and failures"""
+    start = time.perf_counter()
+    try:
+        return resend.Batch.send(params_list)
+    except Exception:
+        RESEND_FAILURES.inc(("batch",))
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        RESEND_DURATION.observe(elapsed, ("batch",))
+        record_phase("email", elapsed)
+
 async def send_notification_email(form_data, uploaded_files=None):
     """Send notification email to both admin and company when a new contact form is submitted"""
     try:
@@ -742,17 +3260,19 @@ async def send_notification_email(form_data, uploaded_files=None):
                 <div style="background-color: white; padding: 15px; border-radius: 5px; border: 1px solid #c8e6c9;">
             """
             
+            # Links for files that are not attached stay valid long enough to act on the email
+            email_url_expiry = signed_url_expiry(EMAIL_SIGNED_URL_TTL)
+            
             for file_info in uploaded_files:
-                file_path = UPLOAD_DIR / file_info["saved_name"]
-                if file_path.exists():
+                if await run_storage(attachment_storage.exists, file_info["saved_name"]):
                     file_size = file_info["file_size"]
                     
                     # Only attach files smaller than 5MB to avoid email size limits
                     if file_size < 5 * 1024 * 1024:  # 5MB limit
                         try:
                             # Read file content for attachment
-                            with open(file_path, "rb") as f:
-                                file_content = f.read()
+                            with timed_phase("fs"):
+                                file_content = await run_storage(attachment_storage.read, file_info["saved_name"])
                             
                             # Encode file content as base64 for Resend
                             file_content_b64 = base64.b64encode(file_content).decode('utf-8')
@@ -775,14 +3295,14 @@ async def send_notification_email(form_data, uploaded_files=None):
                             </div>
                             """
                         except Exception as file_error:
-                            logger.error(f"Error reading file {file_info['saved_name']}: {file_error}")
+                            logger.error("Error reading file %s: %s", file_info['saved_name'], file_error)
                             # Add to HTML display as link instead
                             attachment_html += f"""
                             <div style="display: flex; align-items: center; margin-bottom: 10px; padding: 8px; background-color: #fff3cd; border-radius: 4px;">
                                 <span style="font-size: 16px; margin-right: 10px;">📄</span>
                                 <div>
                                     <strong style="color: #856404;">{file_info["original_name"]}</strong>
-                                    <br><small style="color: #666;">({format_file_size(file_info["file_size"])}) - Available in admin panel</small>
+                                    <br><small style="color: #666;">({format_file_size(file_info["file_size"])}) - <a href="{html_escape(signed_attachment_url(file_info, email_url_expiry, PUBLIC_API_URL))}" style="color: #856404;">Download</a></small>
                                 </div>
                             </div>
                             """
@@ -793,7 +3313,7 @@ async def send_notification_email(form_data, uploaded_files=None):
                             <span style="font-size: 16px; margin-right: 10px;">📄</span>
                             <div>
                                 <strong style="color: #856404;">{file_info["original_name"]}</strong>
-                                <br><small style="color: #666;">({format_file_size(file_info["file_size"])}) - Too large for email, available in admin panel</small>
+                                <br><small style="color: #666;">({format_file_size(file_info["file_size"])}) - Too large for email, <a href="{html_escape(signed_attachment_url(file_info, email_url_expiry, PUBLIC_API_URL))}" style="color: #856404;">download</a></small>
                             </div>
                         </div>
                         """
@@ -804,6 +3324,7 @@ async def send_notification_email(form_data, uploaded_files=None):
             """
         
         # Create email content for notification (matching the design from the image)
+        render_start = time.perf_counter()
         html_content = f"""
         <!DOCTYPE html>
         <html>
@@ -1030,6 +3551,7 @@ async def send_notification_email(form_data, uploaded_files=None):
         </body>
         </html>
         """
+        record_phase("render", time.perf_counter() - render_start)
         
         # Send notification email to BOTH admin Gmail and company Outlook
         params = {
@@ -1044,17 +3566,14 @@ async def send_notification_email(form_data, uploaded_files=None):
         if attachments:
             params["attachments"] = attachments
         
-        logger.info(f"📧 Sending notification email to: {', '.join(NOTIFICATION_EMAILS)}")
+        detail_logger.debug("📧 Sending notification email to: %s", NOTIFICATION_EMAILS)
         if attachments:
-            logger.info(f"📎 Including {len(attachments)} attachments (files under 5MB)")
+            detail_logger.debug("📎 Including %d attachments (files under 5MB)", len(attachments))
         elif uploaded_files:
-            logger.info(f"📎 {len(uploaded_files)} files uploaded but not attached (too large or error)")
+            detail_logger.debug("📎 %d files uploaded but not attached (too large or error)", len(uploaded_files))
         
-        email_response = resend.Emails.send(params)
-        logger.info(f"✅ Dual notification email sent successfully!")
-        logger.info(f"   - Admin Gmail: {ADMIN_EMAIL}")
-        logger.info(f"   - Company Outlook: {COMPANY_EMAIL}")
-        logger.info(f"   - Resend ID: {email_response.get('id', 'Unknown')}")
+        email_response = send_email(params)
+        logger.info("✅ Dual notification email sent to %s and %s (Resend ID: %s)", ADMIN_EMAIL, COMPANY_EMAIL, email_response.get('id', 'Unknown'))
         
         return {
             "success": True,
@@ -1064,39 +3583,17 @@ async def send_notification_email(form_data, uploaded_files=None):
         }
         
     except Exception as e:
-        logger.error(f"❌ Failed to send dual notification email: {e}")
+        logger.error("❌ Failed to send dual notification email: %s", e)
         return {
             "success": False,
             "error": str(e),
             "attempted_recipients": NOTIFICATION_EMAILS
         }
 
-@app.post("/api/send-reply")
-async def send_reply_email(request: Request):
-    """Send email reply directly to user from admin"""
-    try:
-        logger.info("Received email reply request")
-        
-        # Get the JSON data from request
-        email_data = await request.json()
-        logger.info(f"Email data received: {email_data}")
-        
-        # Validate required fields
-        required_fields = ['to_email', 'to_name', 'reply_message']
-        for field in required_fields:
-            if not email_data.get(field):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Missing required field: {field}"
-                )
-        
-        to_email = email_data['to_email']
-        to_name = email_data['to_name']
-        reply_message = email_data['reply_message']
-        original_message = email_data.get('original_message', '')
-        
-        # Create professional reply email content for the user
-        html_content = f"""
+def render_reply_email(to_name, reply_message, original_message=""):
+    """Render the HTML and plain text bodies of an admin reply email"""
+    # Create professional reply email content for the user
+    html_content = f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -1238,8 +3735,8 @@ async def send_reply_email(request: Request):
         </html>
         """
         
-        # Create plain text version
-        text_content = f"""
+    # Create plain text version
+    text_content = f"""
         Dear {to_name},
 
         Thank you for contacting MECHGENZ Trading Contracting & Services. We appreciate your inquiry and are pleased to respond to your message.
@@ -1265,9 +3762,39 @@ async def send_reply_email(request: Request):
 
         © 2024 MECHGENZ W.L.L. All Rights Reserved.
         """
+    
+    return html_content, text_content
+
+@app.post("/api/send-reply", dependencies=[Depends(require_admin)])
+async def send_reply_email(request: Request):
+    """Send email reply directly to user from admin"""
+    try:
+        detail_logger.debug("Received email reply request")
+        
+        # Get the JSON data from request
+        email_data = await request.json()
+        detail_logger.debug("Email data received: %s", email_data)
+        
+        # Validate required fields
+        required_fields = ['to_email', 'to_name', 'reply_message']
+        for field in required_fields:
+            if not email_data.get(field):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Missing required field: {field}"
+                )
+        
+        to_email = email_data['to_email']
+        to_name = email_data['to_name']
+        reply_message = email_data['reply_message']
+        original_message = email_data.get('original_message', '')
+        
+        # Render the shared reply template for the user
+        with timed_phase("render"):
+            html_content, text_content = render_reply_email(to_name, reply_message, original_message)
         
         # Send email directly to the user using Resend
-        logger.info(f"Sending reply email directly to user {to_name} ({to_email}) using Resend API")
+        detail_logger.debug("Sending reply email directly to user %s (%s) using Resend API", to_name, to_email)
         
         params = {
             "from": "MECHGENZ <info@mechgenz.com>",
@@ -1278,11 +3805,11 @@ async def send_reply_email(request: Request):
             "reply_to": COMPANY_EMAIL
         }
         
-        email_response = resend.Emails.send(params)
-        logger.info(f"Resend API response: {email_response}")
+        email_response = send_email(params)
+        detail_logger.debug("Resend API response: %s", email_response)
         
         if email_response and email_response.get('id'):
-            logger.info(f"Reply email sent successfully to {to_email}. Resend ID: {email_response['id']}")
+            logger.info("Reply email sent successfully to %s. Resend ID: %s", to_email, email_response['id'])
             return {
                 "success": True,
                 "message": f"Reply sent successfully to {to_name} ({to_email})",
@@ -1292,7 +3819,7 @@ async def send_reply_email(request: Request):
                 "timestamp": datetime.utcnow().isoformat()
             }
         else:
-            logger.error(f"Failed to send reply email. Resend response: {email_response}")
+            logger.error("Failed to send reply email. Resend response: %s", email_response)
             raise HTTPException(
                 status_code=500,
                 detail="Failed to send reply email. Please try again."
@@ -1301,24 +3828,271 @@ async def send_reply_email(request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error sending reply email: {e}")
-        logger.error(f"Error type: {type(e).__name__}")
+        logger.error("Error sending reply email: %s", e)
+        logger.error("Error type: %s", type(e).__name__)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to send reply email: {str(e)}"
         )
 
+@app.post("/api/send-replies", dependencies=[Depends(require_admin)])
+async def send_batch_replies(request: Request):
+    """Send replies to many submissions at once using Resend's batch API"""
+    try:
+        if not is_db_connected or collection is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Database connection not available"
+            )
+        
+        try:
+            data = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body must be valid JSON")
+        replies = data.get("replies") if isinstance(data, dict) else None
+        
+        if not isinstance(replies, list) or len(replies) == 0:
+            raise HTTPException(
+                status_code=400,
+                detail="A non-empty 'replies' list is required"
+            )
+        
+        if len(replies) > MAX_BATCH_REPLIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many replies in one request. Maximum: {MAX_BATCH_REPLIES}"
+            )
+        
+        # Validate (submission_id, message) pairs
+        reply_messages = {}
+        for index, reply in enumerate(replies):
+            if not isinstance(reply, dict):
+                reply = {}
+            submission_id = reply.get("submission_id")
+            reply_message = reply.get("message")
+            reply_message = reply_message.strip() if isinstance(reply_message, str) else ""
+            
+            if not isinstance(submission_id, str) or not ObjectId.is_valid(submission_id):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid submission_id in reply {index}"
+                )
+            if not reply_message:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Missing message in reply {index}"
+                )
+            if submission_id in reply_messages:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Duplicate submission_id in reply {index}: {submission_id}"
+                )
+            
+            reply_messages[submission_id] = reply_message
+        
+        # Fetch every targeted submission in a single query
+        cursor = collection.find(
+            {"_id": {"$in": [ObjectId(submission_id) for submission_id in reply_messages]}, **NOT_DELETED},
+            {"name": 1, "email": 1, "message": 1}
+        )
+        submissions = {str(doc["_id"]): doc for doc in cursor}
+        
+        results = []
+        pending = []
+        for submission_id, reply_message in reply_messages.items():
+            submission = submissions.get(submission_id)
+            if not submission or not submission.get("email"):
+                results.append({
+                    "submission_id": submission_id,
+                    "success": False,
+                    "error": "Submission not found" if not submission else "Submission has no email address"
+                })
+                continue
+            
+            to_name = submission.get("name") or submission["email"]
+            with timed_phase("render"):
+                html_content, text_content = render_reply_email(to_name, reply_message, submission.get("message", ""))
+            pending.append((submission_id, {
+                "from": "MECHGENZ <info@mechgenz.com>",
+                "to": [submission["email"]],
+                "subject": "Reply from MECHGENZ - Your Inquiry",
+                "html": html_content,
+                "text": text_content,
+                "reply_to": COMPANY_EMAIL
+            }))
+        
+        # Send in chunks that fit Resend's batch limit
+        status_updates = []
+        replied_ids = []
+        replied_at = datetime.utcnow()
+        for start in range(0, len(pending), RESEND_BATCH_SIZE):
+            chunk = pending[start:start + RESEND_BATCH_SIZE]
+            detail_logger.debug("Sending batch of %d reply emails using Resend API", len(chunk))
+            
+            try:
+                batch_response = send_email_batch([params for _, params in chunk])
+                sent_emails = batch_response.get("data", []) if batch_response else []
+            except Exception as e:
+                logger.error("Resend batch send failed: %s", e)
+                for submission_id, _ in chunk:
+                    results.append({
+                        "submission_id": submission_id,
+                        "success": False,
+                        "error": str(e)
+                    })
+                continue
+            
+            # Resend returns one email object per message, in request order
+            for position, (submission_id, params) in enumerate(chunk):
+                email_id = sent_emails[position].get("id") if position < len(sent_emails) else None
+                if not email_id:
+                    results.append({
+                        "submission_id": submission_id,
+                        "success": False,
+                        "error": "No email ID returned by Resend"
+                    })
+                    continue
+                
+                results.append({
+                    "submission_id": submission_id,
+                    "success": True,
+                    "email_id": email_id,
+                    "customer_email": params["to"][0]
+                })
+                replied_ids.append(ObjectId(submission_id))
+                status_updates.append(UpdateOne(
+                    {"_id": ObjectId(submission_id)},
+                    {"$set": {"status": "replied", "updated_at": replied_at}}
+                ))
+        
+        # Mark every delivered reply in a single round-trip
+        updated_count = 0
+        if status_updates:
+            try:
+                # Previous statuses feed the live stats deltas
+                previous_statuses = {
+                    doc["_id"]: doc.get("status")
+                    for doc in collection.find({"_id": {"$in": replied_ids}}, {"status": 1})
+                }
+                write_result = collection.bulk_write(status_updates, ordered=False)
+                updated_count = write_result.modified_count
+                for submission_id, previous_status in previous_statuses.items():
+                    if previous_status != "replied":
+                        publish_event("submission.updated", {
+                            "submission_id": str(submission_id),
+                            "status": "replied",
+                            "previous_status": previous_status,
+                            "stats": stats_delta(0, {previous_status: -1, "replied": 1})
+                        })
+            except PyMongoError as e:
+                logger.error("MongoDB error updating replied statuses: %s", e)
+        
+        sent_count = len(status_updates)
+        failed_count = len(results) - sent_count
+        logger.info("Batch reply finished: %d sent, %d failed, %d statuses updated", sent_count, failed_count, updated_count)
+        
+        if sent_count == 0:
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to send any reply emails. Please try again."
+            )
+        
+        return {
+            "success": failed_count == 0,
+            "message": f"Sent {sent_count} of {len(results)} replies",
+            "sent_count": sent_count,
+            "failed_count": failed_count,
+            "statuses_updated": updated_count,
+            "results": results,
+            "timestamp": replied_at.isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error sending batch replies: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to send batch replies: {str(e)}"
+        )
+
+def clean_contact_form(name, email, phone, message):
+    """Validate required contact form fields and return the trimmed form data"""
+    if not name.strip():
+        raise HTTPException(status_code=400, detail="Name is required")
+    if not email.strip():
+        raise HTTPException(status_code=400, detail="Email is required")
+    if not message.strip():
+        raise HTTPException(status_code=400, detail="Message is required")
+    
+    return {
+        "name": name.strip(),
+        "email": email.strip(),
+        "phone": phone.strip() if phone else "",
+        "message": message.strip()
+    }
+
 @app.post("/api/contact")
 async def submit_contact_form(
+    request: Request,
     name: str = Form(...),
     email: str = Form(...),
     phone: str = Form(None),
     message: str = Form(...),
     files: List[UploadFile] = File(None)
 ):
+    """Contact form endpoint; a retry with the same Idempotency-Key gets the first response back"""
+    client = client_address(request.scope, FORWARDED_HOPS)
+    key = request.headers.get("idempotency-key")
+    if not key:
+        return await process_contact_form(name, email, phone, message, files, client)
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+    if not is_db_connected or idempotency_collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available. Please check MongoDB configuration."
+        )
+    
+    key = f"contact:{key}"
+    fingerprint = hashlib.sha256(orjson.dumps([
+        name, email, phone, message, [(file.filename, file.size) for file in files or ()]
+    ])).hexdigest()
+    
+    # Retries usually land on the worker that answered first, which still has the response in memory
+    entry = cached_idempotent_response(key)
+    if entry is None:
+        entry = claim_idempotency_key(key, fingerprint)
+    if entry is not None:
+        return replay_idempotent_response(fingerprint, entry)
+    
+    try:
+        response = await process_contact_form(name, email, phone, message, files, client, idempotency_key=key)
+    except BaseException:
+        release_idempotency_key(key)
+        raise
+    # The submission is stored by now; a stale claim is resolved from it rather than processed again
+    try:
+        complete_idempotency_key(key, fingerprint, response)
+    except PyMongoError as e:
+        logger.warning("Could not complete idempotency key: %s", e)
+    return response
+
+def contact_response(submission_id, submitted_at, files_uploaded):
+    return {
+        "success": True,
+        "message": "Contact form submitted successfully",
+        "submission_id": str(submission_id),
+        "timestamp": submitted_at.isoformat(),
+        "files_uploaded": files_uploaded,
+        "notifications_sent_to": NOTIFICATION_EMAILS
+    }
+
+async def process_contact_form(name, email, phone, message, files, client, idempotency_key=None):
     """Handle contact form submissions with optional file uploads"""
+    record_parse_phase()
     try:
-        logger.info("📝 Received contact form submission")
+        detail_logger.debug("📝 Received contact form submission")
         
         # Check if database connection is available
         if not is_db_connected or collection is None:
@@ -1328,28 +4102,14 @@ async def submit_contact_form(
                 detail="Database connection not available. Please check MongoDB configuration."
             )
         
-        # Validate required fields
-        if not name.strip():
-            raise HTTPException(status_code=400, detail="Name is required")
-        if not email.strip():
-            raise HTTPException(status_code=400, detail="Email is required")
-        if not message.strip():
-            raise HTTPException(status_code=400, detail="Message is required")
-        
-        # Prepare form data
-        form_data = {
-            "name": name.strip(),
-            "email": email.strip(),
-            "phone": phone.strip() if phone else "",
-            "message": message.strip()
-        }
+        form_data = clean_contact_form(name, email, phone, message)
         
-        logger.info(f"Form data: {form_data}")
+        detail_logger.debug("Form data: %s", form_data)
         
         # Handle file uploads
         uploaded_files = []
         if files and len(files) > 0:
-            logger.info(f"Processing {len(files)} uploaded files")
+            detail_logger.debug("Processing %d uploaded files", len(files))
             
             for file in files:
                 if file.filename and file.filename.strip():
@@ -1361,9 +4121,8 @@ async def submit_contact_form(
                             detail=f"File type '{file_extension}' not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
                         )
                     
-                    # Read file content
-                    file_content = await file.read()
-                    file_size = len(file_content)
+                    # Size comes from the spooled upload, so the content is not loaded into memory
+                    file_size = file.size if file.size is not None else len(await file.read())
                     
                     if file_size > MAX_FILE_SIZE:
                         raise HTTPException(
@@ -1376,89 +4135,108 @@ async def submit_contact_form(
                     
                     # Generate unique filename
                     unique_id = uuid.uuid4().hex[:8]
-                    safe_filename = f"{unique_id}_{file.filename}"
-                    file_path = UPLOAD_DIR / safe_filename
+                    safe_filename = f"{unique_id}_{Path(file.filename).name}"
                     
-                    # Save file to disk
-                    with open(file_path, "wb") as buffer:
-                        buffer.write(file_content)
+                    # Stream the upload into storage
+                    await file.seek(0)
+                    with timed_phase("fs"):
+                        stored = await run_storage(attachment_storage.put, safe_filename, file.file, file.content_type)
                     
                     # Store file information
                     file_info = {
                         "original_name": file.filename,
                         "saved_name": safe_filename,
                         "file_size": file_size,
-                        "content_type": file.content_type or "application/octet-stream"
+                        "content_type": file.content_type or "application/octet-stream",
+                        "sha256": stored["sha256"]
                     }
                     uploaded_files.append(file_info)
+                    UPLOAD_FILES.inc(("attachment",))
+                    UPLOAD_BYTES.inc(("attachment",), file_size)
                     
-                    logger.info(f"✅ Saved file: {file.filename} -> {safe_filename} ({format_file_size(file_size)})")
+                    logger.info("✅ Saved file: %s -> %s (%s)", file.filename, safe_filename, format_file_size(file_size))
+        
+        # Near-duplicate bursts and fast repeat senders are kept for review without emailing anyone;
+        # screened only once the request is valid, so a corrected retry is not held against the sender
+        spam = None
+        screening = SPAM_FILTER_MODE in ("quarantine", "flag")
+        if screening:
+            reasons = spam_screen.check(form_data["message"], form_data["email"], client)
+            if reasons:
+                spam = {"reasons": reasons, "screened_at": datetime.utcnow()}
+                logger.warning("Contact submission screened as spam (%s)", ", ".join(reasons))
         
         # Prepare submission data for database
         submission_data = {
             **form_data,
             "uploaded_files": uploaded_files,
             "submitted_at": datetime.utcnow(),
-            "status": "new"
+            "status": "spam" if spam and SPAM_FILTER_MODE == "quarantine" else "new"
         }
+        if spam:
+            submission_data["spam"] = spam
+        if idempotency_key:
+            submission_data["idempotency_key"] = idempotency_key
         
-        logger.info(f"Submission data to be stored: {submission_data}")
+        detail_logger.debug("Submission data to be stored: %s", submission_data)
         
         # Store in MongoDB
         try:
             result = collection.insert_one(submission_data)
-            logger.info(f"✅ Successfully stored submission with ID: {result.inserted_id}")
+            logger.info("✅ Successfully stored submission with ID: %s", result.inserted_id)
+            if screening:
+                spam_screen.record(form_data["message"], form_data["email"], client)
+            publish_event("submission.created", {
+                "submission": next(with_download_urls(
+                    [{**submission_data, "uploaded_files": [dict(file_info) for file_info in uploaded_files]}], PUBLIC_API_URL
+                )),
+                "stats": stats_delta(1, {submission_data["status"]: 1})
+            })
         except PyMongoError as e:
-            logger.error(f"MongoDB error: {e}")
+            logger.error("MongoDB error: %s", e)
             # Clean up uploaded files if database save failed
-            for file_info in uploaded_files:
-                file_path = UPLOAD_DIR / file_info["saved_name"]
-                if file_path.exists():
-                    file_path.unlink()
+            await run_storage(attachment_storage.delete_many, [file_info["saved_name"] for file_info in uploaded_files])
             raise HTTPException(
                 status_code=500,
                 detail="Database error occurred while storing submission"
             )
         
         # Send dual notification email (to both admin and company) with attachments
-        try:
-            email_result = await send_notification_email(form_data, uploaded_files)
-            if email_result.get("success"):
-                logger.info(f"✅ Dual notification emails sent successfully to: {', '.join(email_result.get('sent_to', []))}")
-                if email_result.get("attachments_included", 0) > 0:
-                    logger.info(f"📎 {email_result['attachments_included']} attachments included in notification")
-            else:
-                logger.warning(f"⚠️ Email notification failed: {email_result.get('error')}")
-        except Exception as e:
-            logger.error(f"Failed to send notification email: {e}")
-            # Don't fail the entire request if email fails
+        if spam:
+            detail_logger.debug("Skipped notification emails for suspected spam")
+        else:
+            try:
+                email_result = await send_notification_email(form_data, uploaded_files)
+                if email_result.get("success"):
+                    detail_logger.debug("✅ Dual notification emails sent successfully to: %s", email_result.get('sent_to', []))
+                    if email_result.get("attachments_included", 0) > 0:
+                        detail_logger.debug("📎 %d attachments included in notification", email_result['attachments_included'])
+                else:
+                    logger.warning("⚠️ Email notification failed: %s", email_result.get('error'))
+            except Exception as e:
+                logger.error("Failed to send notification email: %s", e)
+                # Don't fail the entire request if email fails
         
-        return {
-            "success": True,
-            "message": "Contact form submitted successfully",
-            "submission_id": str(result.inserted_id),
-            "timestamp": datetime.utcnow().isoformat(),
-            "files_uploaded": len(uploaded_files),
-            "notifications_sent_to": NOTIFICATION_EMAILS
-        }
+        return contact_response(result.inserted_id, datetime.utcnow(), len(uploaded_files))
         
     except HTTPException:
         raise
     except PyMongoError as e:
-        logger.error(f"MongoDB error: {e}")
+        logger.error("MongoDB error: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Database error occurred while processing submission"
         )
     except Exception as e:
-        logger.error(f"Unexpected error in submit_contact_form: {e}")
+        logger.error("Unexpected error in submit_contact_form: %s", e)
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred while processing your submission"
         )
 
-@app.get("/api/submissions")
+@app.get("/api/submissions", dependencies=[Depends(require_admin)])
 async def get_submissions(
+    request: Request,
     limit: Optional[int] = 50,
     skip: Optional[int] = 0,
     status: Optional[str] = None
@@ -1472,50 +4250,43 @@ async def get_submissions(
             )
         
         # Build query filter
-        query_filter = {}
+        query_filter = dict(NOT_DELETED)
         if status:
             query_filter["status"] = status
         
-        # Get submissions with pagination
+        # Get submissions with pagination, encoded straight from the cursor with signed attachment URLs
         cursor = collection.find(query_filter).sort("submitted_at", -1).skip(skip).limit(limit)
-        submissions = []
-        
-        for doc in cursor:
-            # Convert ObjectId to string for JSON serialization
-            doc["_id"] = str(doc["_id"])
-            # Convert datetime to ISO string
-            if "submitted_at" in doc:
-                doc["submitted_at"] = doc["submitted_at"].isoformat()
-            submissions.append(doc)
+        base_url = str(request.base_url).rstrip("/")
+        submissions, returned_count = encode_documents(with_download_urls(cursor, base_url))
         
         # Get total count
         total_count = collection.count_documents(query_filter)
         
-        return {
+        return BSONResponse({
             "success": True,
             "submissions": submissions,
             "total_count": total_count,
-            "returned_count": len(submissions),
+            "returned_count": returned_count,
             "skip": skip,
             "limit": limit
-        }
+        })
         
     except HTTPException:
         raise
     except PyMongoError as e:
-        logger.error(f"MongoDB error: {e}")
+        logger.error("MongoDB error: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Database error occurred while retrieving submissions"
         )
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred"
         )
 
-@app.put("/api/submissions/{submission_id}/status")
+@app.put("/api/submissions/{submission_id}/status", dependencies=[Depends(require_admin)])
 async def update_submission_status(submission_id: str, request: Request):
     """Update the status of a specific submission"""
     try:
@@ -1535,23 +4306,32 @@ async def update_submission_status(submission_id: str, request: Request):
                 detail="Status field is required"
             )
         
-        # Update the submission
-        result = collection.update_one(
-            {"_id": ObjectId(submission_id)},
+        # Update the submission, keeping the previous status for the stats delta
+        previous = collection.find_one_and_update(
+            {"_id": ObjectId(submission_id), **NOT_DELETED},
             {
                 "$set": {
                     "status": new_status,
                     "updated_at": datetime.utcnow()
                 }
-            }
+            },
+            projection={"status": 1}
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(
                 status_code=404,
                 detail="Submission not found"
             )
         
+        previous_status = previous.get("status")
+        publish_event("submission.updated", {
+            "submission_id": submission_id,
+            "status": new_status,
+            "previous_status": previous_status,
+            "stats": stats_delta(0, {previous_status: -1, new_status: 1} if previous_status != new_status else {})
+        })
+        
         return {
             "success": True,
             "message": "Submission status updated successfully",
@@ -1562,13 +4342,13 @@ async def update_submission_status(submission_id: str, request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating submission status: {e}")
+        logger.error("Error updating submission status: %s", e)
         raise HTTPException(
             status_code=500,
             detail="An error occurred while updating submission status"
         )
 
-@app.delete("/api/submissions/{submission_id}")
+@app.delete("/api/submissions/{submission_id}", dependencies=[Depends(require_admin)])
 async def delete_submission(submission_id: str):
     """Delete a specific submission and its associated files"""
     try:
@@ -1578,56 +4358,696 @@ async def delete_submission(submission_id: str):
                 detail="Database connection not available"
             )
         
-        # Get submission first to check for files
-        submission = collection.find_one({"_id": ObjectId(submission_id)})
+        # Hide the submission now; the purge worker removes its files and then the document after the grace period
+        now = datetime.utcnow()
+        purge_after = purge_deadline(now)
+        submission = collection.find_one_and_update(
+            {"_id": ObjectId(submission_id), **NOT_DELETED},
+            {"$set": {"deleted_at": now, "purge_after": purge_after}},
+            projection={"status": 1}
+        )
         if not submission:
             raise HTTPException(
                 status_code=404,
                 detail="Submission not found"
             )
         
-        # Delete associated files
-        uploaded_files = submission.get("uploaded_files", [])
-        for file_info in uploaded_files:
-            file_path = UPLOAD_DIR / file_info["saved_name"]
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Deleted file: {file_info['saved_name']}")
-        
-        # Delete submission from database
-        result = collection.delete_one({"_id": ObjectId(submission_id)})
-        
-        if result.deleted_count == 0:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to delete submission"
-            )
-        
-        logger.info(f"Deleted submission {submission_id} and {len(uploaded_files)} associated files")
+        logger.info("Deleted submission %s, restorable until %s", submission_id, purge_after.isoformat())
+        publish_event("submission.deleted", {
+            "submission_id": submission_id,
+            "stats": stats_delta(-1, {submission.get("status"): -1})
+        })
         
         return {
             "success": True,
             "message": "Submission deleted successfully",
             "submission_id": submission_id,
-            "files_deleted": len(uploaded_files)
+            "purge_after": purge_after.isoformat()
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting submission: {e}")
+        logger.error("Error deleting submission: %s", e)
         raise HTTPException(
             status_code=500,
             detail="An error occurred while deleting submission"
         )
 
+@app.post("/api/submissions/{submission_id}/restore", dependencies=[Depends(require_admin)])
+async def restore_submission(submission_id: str):
+    """Undo the deletion of a submission that has not been purged yet"""
+    if not is_db_connected or collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    if not ObjectId.is_valid(submission_id):
+        raise HTTPException(status_code=400, detail="Invalid submission ID")
+    
+    submission = collection.find_one_and_update(
+        {"_id": ObjectId(submission_id), "deleted_at": {"$ne": None}, "purge_after": {"$gt": restorable_until(datetime.utcnow())}},
+        {"$unset": {"deleted_at": "", "purge_after": ""}},
+        return_document=ReturnDocument.AFTER
+    )
+    if submission is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No deleted submission with this ID can be restored"
+        )
+    
+    logger.info("Restored submission %s", submission_id)
+    publish_event("submission.restored", {
+        "submission": next(with_download_urls([submission], PUBLIC_API_URL)),
+        "stats": stats_delta(1, {submission.get("status"): 1})
+    })
+    
+    return {
+        "success": True,
+        "message": "Submission restored",
+        "submission_id": submission_id
+    }
+
+# ============================================================================
+# LIVE EVENTS
+# ============================================================================
+
+class EventSubscriber:
+    """One open event stream; overflowed is set when the client falls too far behind"""
+    
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.overflowed = False
+
+class EventBus:
+    """In-process fan-out of admin events, with a replay buffer for resuming streams.
+    
+    Event IDs are (milliseconds, sequence) pairs. floor is the newest ID that may
+    have been missed, either because it was evicted from the buffer or because it
+    happened before this process started listening; resumes from before it need a resync.
+    """
+    
+    def __init__(self, history_size=EVENT_HISTORY_SIZE):
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self.last_id = (int(time.time() * 1000), 0)
+        self.floor = self.last_id
+    
+    def next_id(self):
+        now = int(time.time() * 1000)
+        self.last_id = (now, 0) if now > self.last_id[0] else (self.last_id[0], self.last_id[1] + 1)
+        return self.last_id
+    
+    def publish(self, event_id, event_type, data):
+        """Encode the event once and hand it to every subscriber; must run on the event loop"""
+        self.last_id = max(self.last_id, event_id)
+        frame = encode_event(event_id, event_type, data)
+        if len(self.history) == self.history.maxlen:
+            self.floor = self.history[0][0]
+        self.history.append((event_id, frame))
+        for subscriber in self.subscribers:
+            if subscriber.overflowed:
+                continue
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # The client reconnects with Last-Event-ID and catches up from the buffer
+                subscriber.overflowed = True
+    
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber and return it with the frames it missed since last_event_id"""
+        subscriber = EventSubscriber()
+        self.subscribers.add(subscriber)
+        LIVE_EVENT_SUBSCRIBERS.set(len(self.subscribers))
+        if last_event_id is None:
+            return subscriber, []
+        if last_event_id < self.floor or last_event_id > self.last_id:
+            return subscriber, [encode_event(self.last_id, "resync", {})]
+        return subscriber, [frame for event_id, frame in self.history if event_id > last_event_id]
+    
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        LIVE_EVENT_SUBSCRIBERS.set(len(self.subscribers))
+
+def format_event_id(event_id):
+    return f"{event_id[0]}-{event_id[1]}"
+
+def parse_event_id(value):
+    """Parse a Last-Event-ID; anything unrecognised resumes from before the buffer and resyncs"""
+    try:
+        milliseconds, sequence = value.split("-")
+        return int(milliseconds), int(sequence)
+    except (AttributeError, ValueError):
+        return (0, 0)
+
+def encode_event(event_id, event_type, data):
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+        format_event_id(event_id).encode(), event_type.encode(), orjson.dumps(data, default=bson_default)
+    )
+
+event_bus = EventBus()
+# True while this worker is tailing the shared events collection; events are then published through it
+shared_events_active = False
+shared_events_stop = threading.Event()
+# The watcher thread and its open change stream, closed on shutdown to unblock it
+shared_events_thread = None
+shared_events_stream = None
+
+def stats_delta(total=0, statuses=None):
+    """Change to /api/stats totals carried by an event so dashboards can update without refetching"""
+    return {
+        "total_submissions": total,
+        "status_breakdown": {status: count for status, count in (statuses or {}).items() if count and status is not None}
+    }
+
+def drop_dashboard_cache():
+    global dashboard_version
+    dashboard_version += 1
+    dashboard_cache.clear()
+
+def deliver_event(event_id, event_type, data):
+    """Apply a submission event in this worker: invalidate cached stats and notify subscribers"""
+    drop_dashboard_cache()
+    event_bus.publish(event_id, event_type, data)
+
+def publish_event(event_type, data):
+    """Publish an admin event to every worker's subscribers (or just this process's)"""
+    if shared_events_active:
+        try:
+            events_collection.insert_one({"type": event_type, "data": data, "created_at": datetime.utcnow()})
+            return
+        except PyMongoError as e:
+            logger.warning("Could not share %s event with other workers: %s", event_type, e)
+    deliver_event(event_bus.next_id(), event_type, data)
+
+def watch_shared_events(loop):
+    """Relay events inserted by any worker into this worker's bus; runs in a thread until stopped"""
+    global shared_events_active, shared_events_stream
+    resume_token = None
+    while not shared_events_stop.is_set():
+        if not is_db_connected:
+            shared_events_stop.wait(1)
+            continue
+        try:
+            with events_collection.watch(
+                [{"$match": {"operationType": "insert"}}],
+                resume_after=resume_token,
+                max_await_time_ms=1000
+            ) as stream:
+                shared_events_stream = stream
+                if not shared_events_active:
+                    logger.info("Sharing live events between workers through a change stream")
+                shared_events_active = True
+                while not shared_events_stop.is_set() and stream.alive:
+                    change = stream.try_next()
+                    resume_token = stream.resume_token
+                    if change is None:
+                        continue
+                    # The cluster time orders events identically on every worker
+                    cluster_time = change["clusterTime"]
+                    event = change["fullDocument"]
+                    loop.call_soon_threadsafe(
+                        deliver_event, (cluster_time.time * 1000, cluster_time.inc), event["type"], event["data"]
+                    )
+        except PyMongoError as e:
+            shared_events_active = False
+            if shared_events_stop.is_set():
+                break
+            if getattr(e, "code", None) == 40573:
+                logger.warning("Change streams need a replica set; live events reach only this worker's clients")
+                return
+            logger.warning("Live event change stream interrupted: %s", e)
+            resume_token = None if getattr(e, "code", None) == 286 else resume_token  # history lost
+            shared_events_stop.wait(1)
+        finally:
+            shared_events_stream = None
+    shared_events_active = False
+
+@app.get("/api/events", dependencies=[Depends(require_admin)])
+async def stream_events(request: Request, last_event_id: Optional[str] = None):
+    """Server-Sent Events stream of new submissions, status changes and stats deltas.
+    
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) and receive the events
+    they missed; a resync event asks them to refetch when those are no longer buffered.
+    """
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    
+    async def stream():
+        subscriber, backlog = event_bus.subscribe(parse_event_id(resume_from) if resume_from else None)
+        try:
+            yield f"retry: {EVENT_RETRY_MS}\n\n".encode()
+            for frame in backlog:
+                yield frame
+            while not (subscriber.overflowed and subscriber.queue.empty()):
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), EVENT_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection and lets the client detect a dead one
+                    yield b": heartbeat\n\n"
+        finally:
+            event_bus.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============================================================================
+# IMPORT AND EXPORT ENDPOINTS
+# ============================================================================
+
+# Formats that are already compressed are stored as-is in ZIP exports
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".pdf", ".docx", ".zip"}
+
+def parse_date_param(value, name):
+    """Parse an ISO date or datetime query parameter into naive UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date such as 2025-01-31")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def build_submission_filter(status=None, date_from=None, date_to=None):
+    """Query filter for the status and submitted_at range shared by the export endpoints"""
+    query_filter = dict(NOT_DELETED)
+    if status:
+        query_filter["status"] = status
+    
+    submitted_at = {}
+    start = parse_date_param(date_from, "date_from")
+    if start:
+        submitted_at["$gte"] = start
+    end = parse_date_param(date_to, "date_to")
+    if end:
+        if len(date_to) == 10:
+            # A bare date includes the whole day
+            submitted_at["$lt"] = end + timedelta(days=1)
+        else:
+            submitted_at["$lte"] = end
+    if submitted_at:
+        query_filter["submitted_at"] = submitted_at
+    return query_filter
+
+EXPORT_CSV_COLUMNS = ["_id", "submitted_at", "status", "name", "email", "phone", "message", "attachments", "resume_token"]
+MAX_EXPORT_BATCH_SIZE = 10000
+
+def encode_resume_token(doc):
+    """Opaque keyset position (submitted_at, _id) of an exported row"""
+    submitted_ms = int(doc["submitted_at"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return base64.urlsafe_b64encode(f"{submitted_ms}.{doc['_id']}".encode()).rstrip(b"=").decode()
+
+def decode_resume_token(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        submitted_ms, object_id = base64.urlsafe_b64decode(padded).decode().split(".")
+        submitted_at = datetime.fromtimestamp(int(submitted_ms) / 1000, tz=timezone.utc).replace(tzinfo=None)
+        return submitted_at, ObjectId(object_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid resume_token")
+
+def csv_cell(value):
+    """Stringify a CSV value, neutralising leading characters spreadsheets treat as formulas"""
+    text = "" if value is None else str(value)
+    return f"'{text}" if text[:1] in ("=", "+", "-", "@", "\t", "\r") else text
+
+def export_ndjson_rows(cursor, batch_size):
+    """Yield NDJSON in chunks of batch_size rows"""
+    lines = []
+    try:
+        for doc in cursor:
+            doc["resume_token"] = encode_resume_token(doc)
+            lines.append(orjson.dumps(doc, default=bson_default))
+            if len(lines) >= batch_size:
+                yield b"\n".join(lines) + b"\n"
+                lines.clear()
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    finally:
+        cursor.close()
+
+def export_csv_rows(cursor, batch_size):
+    """Yield CSV with a header row, in chunks of batch_size rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    rows = 0
+    try:
+        for doc in cursor:
+            submitted_at = doc.get("submitted_at")
+            writer.writerow([
+                str(doc["_id"]),
+                submitted_at.isoformat() if isinstance(submitted_at, datetime) else "",
+                csv_cell(doc.get("status")),
+                csv_cell(doc.get("name")),
+                csv_cell(doc.get("email")),
+                csv_cell(doc.get("phone")),
+                csv_cell(doc.get("message")),
+                csv_cell("; ".join(f.get("original_name", "") for f in doc.get("uploaded_files") or ())),
+                encode_resume_token(doc)
+            ])
+            rows += 1
+            if rows >= batch_size:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                rows = 0
+        yield buffer.getvalue().encode()
+    finally:
+        cursor.close()
+
+@app.get("/api/submissions/export", dependencies=[Depends(require_admin)])
+async def export_submissions(
+    fmt: str = Query("ndjson", alias="format"),
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    resume_token: Optional[str] = None
+):
+    """Stream submissions oldest first as NDJSON or CSV straight from a cursor.
+    
+    Every row carries a resume_token; pass the last one received with the same
+    filters to continue an interrupted export after that row.
+    """
+    if not is_db_connected or collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    batch_size = min(max(batch_size, 1), MAX_EXPORT_BATCH_SIZE)
+    
+    query_filter = build_submission_filter(status, date_from, date_to)
+    if resume_token:
+        submitted_at, object_id = decode_resume_token(resume_token)
+        # Keyset continuation: strictly after the last exported (submitted_at, _id)
+        query_filter = {"$and": [query_filter, {"$or": [
+            {"submitted_at": {"$gt": submitted_at}},
+            {"submitted_at": submitted_at, "_id": {"$gt": object_id}}
+        ]}]}
+    
+    projection = None if fmt == "ndjson" else {field: 1 for field in EXPORT_CSV_COLUMNS[1:7] + ["uploaded_files.original_name"]}
+    cursor = collection.find(query_filter, projection).sort([("submitted_at", 1), ("_id", 1)]).batch_size(batch_size)
+    
+    stamp = f"{datetime.utcnow():%Y%m%d-%H%M%S}"
+    if fmt == "csv":
+        return StreamingResponse(
+            export_csv_rows(cursor, batch_size),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="submissions-{stamp}.csv"'}
+        )
+    return StreamingResponse(
+        export_ndjson_rows(cursor, batch_size),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="submissions-{stamp}.ndjson"'}
+    )
+
+class SubmissionImporter:
+    """Validate NDJSON inquiry records like the contact form and insert them in unordered batches"""
+    
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.batch = []
+        self.counts = {"received": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "failed": 0}
+        self.errors = []
+        self.by_status = {}
+        self.by_month = {}
+        self.started = time.perf_counter()
+        self.batches = 0
+    
+    def reject(self, line_number, reason):
+        self.counts["invalid"] += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append({"line": line_number, "error": reason})
+    
+    def add(self, line_number, line):
+        """Validate one NDJSON line; returns True when a batch is ready to flush"""
+        line = line.strip()
+        if not line:
+            return False
+        self.counts["received"] += 1
+        try:
+            record = orjson.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record must be a JSON object")
+            form_data = clean_contact_form(
+                str(record.get("name") or ""),
+                str(record.get("email") or ""),
+                str(record.get("phone") or ""),
+                str(record.get("message") or "")
+            )
+            submitted_at = parse_date_param(str(record.get("submitted_at") or ""), "submitted_at") or datetime.utcnow()
+        except HTTPException as e:
+            self.reject(line_number, e.detail)
+            return False
+        except ValueError as e:
+            self.reject(line_number, str(e))
+            return False
+        
+        # Natural key: the same sender, time and message is the same inquiry
+        natural_key = hashlib.sha256(
+            f"{form_data['email'].lower()}|{submitted_at.isoformat()}|{form_data['message']}".encode()
+        ).hexdigest()[:32]
+        self.batch.append({
+            **form_data,
+            "uploaded_files": [],
+            "submitted_at": submitted_at,
+            "status": str(record.get("status") or "new"),
+            "source": str(record.get("source") or "import"),
+            "natural_key": natural_key,
+            "imported_at": datetime.utcnow()
+        })
+        return len(self.batch) >= self.batch_size
+    
+    def flush(self):
+        """Insert the pending batch; duplicates of the natural key are counted, not raised"""
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        failed_indexes = set()
+        try:
+            collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed_indexes.add(error["index"])
+                if error.get("code") == 11000:
+                    self.counts["duplicates"] += 1
+                else:
+                    self.counts["failed"] += 1
+                    if len(self.errors) < MAX_IMPORT_ERRORS:
+                        self.errors.append({"line": None, "error": error.get("errmsg", "write error")})
+        
+        for index, doc in enumerate(batch):
+            if index in failed_indexes:
+                continue
+            self.counts["inserted"] += 1
+            self.by_status[doc["status"]] = self.by_status.get(doc["status"], 0) + 1
+            month = doc["submitted_at"].strftime("%Y-%m")
+            self.by_month[month] = self.by_month.get(month, 0) + 1
+        
+        self.batches += 1
+        if self.batches % 10 == 0:
+            logger.info("Import progress: %(received)d received, %(inserted)d inserted, %(duplicates)d duplicates, %(invalid)d invalid", self.counts)
+    
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            **self.counts,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.counts["received"] / elapsed) if elapsed > 0 else None,
+            "by_status": self.by_status,
+            "by_month": dict(sorted(self.by_month.items())),
+            "errors": self.errors
+        }
+
+@app.post("/api/submissions/import", dependencies=[Depends(require_admin)])
+async def import_submissions(request: Request):
+    """Import historical inquiries from an NDJSON request body, one JSON object per line.
+    
+    Records are validated with the contact form rules; records whose email,
+    submitted_at and message match an existing import are skipped as duplicates.
+    """
+    if not is_db_connected or collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    
+    importer = SubmissionImporter()
+    line_number = 0
+    pending = b""
+    
+    # Validate while the body streams in; inserts run in a worker thread
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if importer.add(line_number, line):
+                await asyncio.to_thread(importer.flush)
+    if pending:
+        importer.add(line_number + 1, pending)
+    await asyncio.to_thread(importer.flush)
+    
+    summary = importer.summary()
+    if summary["inserted"]:
+        publish_event("submissions.imported", {
+            "count": summary["inserted"],
+            "stats": stats_delta(summary["inserted"], summary["by_status"])
+        })
+    logger.info("Import finished: %d inserted, %d duplicates, %d invalid, %s rows/s",
+                summary["inserted"], summary["duplicates"], summary["invalid"], summary["rows_per_second"])
+    return {"success": True, **summary}
+
+class ZipStreamBuffer:
+    """Write-only sink for zipfile; each drain hands out what was written since the last one"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def safe_archive_name(value):
+    cleaned = "".join(c if c.isalnum() or c in " ._-" else "_" for c in value).strip(" .")
+    return cleaned[:80] or "file"
+
+def stream_attachments_zip(cursor):
+    """Yield a ZIP of every attachment of the submissions in cursor, one storage chunk at a time"""
+    sink = ZipStreamBuffer()
+    missing = []
+    try:
+        # An unseekable sink makes zipfile write data descriptors instead of seeking back
+        with zipfile.ZipFile(sink, mode="w") as archive:
+            for submission in cursor:
+                submitted_at = submission.get("submitted_at")
+                folder = "_".join(filter(None, [
+                    submitted_at.strftime("%Y-%m-%d") if isinstance(submitted_at, datetime) else None,
+                    safe_archive_name(submission.get("name", "")),
+                    str(submission["_id"])
+                ]))
+                used_names = set()
+                
+                for file_info in submission.get("uploaded_files") or ():
+                    key = file_info.get("saved_name")
+                    info = attachment_storage.stat(key) if key else None
+                    if info is None:
+                        missing.append(f"{folder}/{file_info.get('original_name', key)}")
+                        continue
+                    
+                    name = safe_archive_name(file_info.get("original_name") or key)
+                    if name in used_names:
+                        name = f"{Path(name).stem}_{key[:8]}{Path(name).suffix}"
+                    used_names.add(name)
+                    
+                    entry = zipfile.ZipInfo(f"{folder}/{name}", date_time=(
+                        submitted_at.timetuple()[:6] if isinstance(submitted_at, datetime) else (1980, 1, 1, 0, 0, 0)
+                    ))
+                    entry.compress_type = zipfile.ZIP_STORED if Path(name).suffix.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                    entry.file_size = info["size"]
+                    
+                    with archive.open(entry, mode="w", force_zip64=info["size"] >= zipfile.ZIP64_LIMIT) as target:
+                        for chunk in attachment_storage.open_range(key):
+                            target.write(chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
+            
+            if missing:
+                archive.writestr("MISSING.txt", "Files referenced by submissions but not found in storage:\n" + "\n".join(missing) + "\n")
+        # Remaining data descriptors, the manifest and the central directory
+        yield sink.drain()
+    finally:
+        cursor.close()
+
+def attachments_zip_response(query_filter, download_name):
+    cursor = collection.find(
+        {**query_filter, "uploaded_files.0": {"$exists": True}},
+        {"name": 1, "submitted_at": 1, "uploaded_files": 1}
+    ).sort("submitted_at", -1).batch_size(EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        stream_attachments_zip(cursor),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{download_name}"'}
+    )
+
+@app.get("/api/submissions/attachments.zip", dependencies=[Depends(require_admin)])
+async def export_attachments(
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """Stream a ZIP of the attachments of all submissions matching the filters"""
+    if not is_db_connected or collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    
+    query_filter = build_submission_filter(status, date_from, date_to)
+    return attachments_zip_response(query_filter, f"attachments-{datetime.utcnow():%Y%m%d-%H%M%S}.zip")
+
+@app.get("/api/submissions/{submission_id}/attachments.zip", dependencies=[Depends(require_admin)])
+async def export_submission_attachments(submission_id: str):
+    """Stream a ZIP of all attachments of one submission"""
+    if not is_db_connected or collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    if not ObjectId.is_valid(submission_id):
+        raise HTTPException(status_code=400, detail="Invalid submission ID")
+    
+    submission = collection.find_one({"_id": ObjectId(submission_id), **NOT_DELETED}, {"_id": 1})
+    if submission is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Submission not found"
+        )
+    
+    return attachments_zip_response({"_id": submission["_id"]}, f"attachments-{submission_id}.zip")
+
 # ============================================================================
 # GALLERY MANAGEMENT ENDPOINTS
 # ============================================================================
 
+def drop_gallery_snapshot():
+    """Drop this worker's cached gallery payload"""
+    global gallery_snapshot, gallery_version
+    gallery_snapshot = None
+    gallery_version += 1
+
+def invalidate_gallery_snapshot():
+    """Drop the cached gallery payload after any gallery write, in every worker"""
+    drop_gallery_snapshot()
+    if MULTI_WORKER_MODE:
+        bump_shared_gallery_version()
+
+async def stat_uploaded_images(docs):
+    """Stat the uploaded file behind each gallery document that has one; returns {filename: stat or None}"""
+    return await stat_objects(image_storage, [
+        doc["current_url"].replace("/images/", "") for doc in docs if doc.get("current_url", "").startswith("/images/")
+    ])
+
 @app.get("/api/website-images")
-async def get_website_images():
+async def get_website_images(request: Request):
     """Get all website images in format expected by admin panels"""
+    global gallery_snapshot, gallery_snapshot_built_at
     try:
         if not is_db_connected or gallery_collection is None:
             logger.warning("Database not connected, returning empty gallery")
@@ -1637,57 +5057,49 @@ async def get_website_images():
                 "total_count": 0
             }
         
-        logger.info("Fetching images from gallery collection...")
-        
-        # Fetch all images from database
-        cursor = gallery_collection.find({})
-        images = {}
-        doc_count = 0
-        processed_count = 0
-        
-        for doc in cursor:
-            doc_count += 1
-            logger.info(f"Processing document {doc_count}: {doc.get('id', 'NO_ID')}")
-            
-            # Check if the document has 'id' field
-            image_id = doc.get("id")
-            if not image_id:
-                logger.warning(f"Document missing 'id' field, skipping: {list(doc.keys())}")
-                continue
-            
-            try:
-                # Convert MongoDB document to the expected format
-                images[image_id] = {
-                    "id": image_id,
-                    "name": doc.get("name", "Unknown"),
-                    "description": doc.get("description", "No description"),
-                    "current_url": doc.get("current_url", ""),
-                    "default_url": doc.get("default_url", ""),
-                    "locations": doc.get("locations", []),
-                    "recommended_size": doc.get("recommended_size", ""),
-                    "category": doc.get("category", "other"),
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-                processed_count += 1
-                logger.info(f"Successfully processed image: {image_id}")
-                
-            except Exception as doc_error:
-                logger.error(f"Error processing document {image_id}: {doc_error}")
-                continue
-        
-        logger.info(f"Processed {processed_count} out of {doc_count} documents")
-        logger.info(f"Final images dict has {len(images)} items")
-        
-        return {
+        # Serve the precompressed snapshot until a gallery write or the TTL invalidates it
+        if gallery_snapshot is not None and time.monotonic() - gallery_snapshot_built_at < GALLERY_CACHE_TTL:
+            return gallery_snapshot.response(request)
+        
+        version = gallery_version
+        
+        # Shape documents in MongoDB so they can be encoded without a Python loop
+        cursor = gallery_collection.aggregate([
+            {"$match": {"id": {"$nin": [None, ""]}, **NOT_DELETED}},
+            {"$project": {
+                "_id": 0,
+                "id": 1,
+                "name": {"$ifNull": ["$name", "Unknown"]},
+                "description": {"$ifNull": ["$description", "No description"]},
+                "current_url": {"$ifNull": ["$current_url", ""]},
+                "default_url": {"$ifNull": ["$default_url", ""]},
+                "locations": {"$ifNull": ["$locations", []]},
+                "recommended_size": {"$ifNull": ["$recommended_size", ""]},
+                "category": {"$ifNull": ["$category", "other"]},
+                "updated_at": {"$ifNull": ["$updated_at", datetime.utcnow()]}
+            }}
+        ])
+        images = {doc["id"]: doc for doc in cursor}
+        
+        detail_logger.debug("Fetched %d website images", len(images))
+        
+        snapshot = PrecompressedPayload(orjson.dumps({
             "success": True,
             "images": images,
             "total_count": len(images)
-        }
+        }, default=bson_default))
+        
+        # Only keep the snapshot if no gallery write happened while it was being built
+        if version == gallery_version:
+            gallery_snapshot = snapshot
+            gallery_snapshot_built_at = time.monotonic()
+        
+        return snapshot.response(request)
         
     except Exception as e:
-        logger.error(f"Error fetching website images: {e}")
+        logger.error("Error fetching website images: %s", e)
         import traceback
-        logger.error(f"Full traceback: {traceback.format_exc()}")
+        logger.error("Full traceback: %s", traceback.format_exc())
         return {
             "success": False,
             "images": {},
@@ -1706,10 +5118,10 @@ async def get_image_categories():
             }
         
         # Get unique categories from database
-        categories = gallery_collection.distinct("category")
+        categories = gallery_collection.distinct("category", NOT_DELETED)
         categories.sort()
         
-        logger.info(f"Retrieved {len(categories)} image categories")
+        logger.info("Retrieved %s image categories", len(categories))
         
         return {
             "success": True,
@@ -1717,15 +5129,16 @@ async def get_image_categories():
         }
         
     except Exception as e:
-        logger.error(f"Error fetching image categories: {e}")
+        logger.error("Error fetching image categories: %s", e)
         return {
             "success": True,
             "categories": ["hero", "about", "services", "portfolio", "contact", "team", "branding", "testimonials", "trading"]
         }
 
-@app.post("/api/website-images/{image_id}/upload")
+@app.post("/api/website-images/{image_id}/upload", dependencies=[Depends(require_admin)])
 async def upload_image(image_id: str, file: UploadFile = File(...)):
     """Upload a new image for a specific image slot"""
+    record_parse_phase()
     try:
         if not is_db_connected or gallery_collection is None:
             raise HTTPException(
@@ -1734,7 +5147,7 @@ async def upload_image(image_id: str, file: UploadFile = File(...)):
             )
         
         # Check if image exists
-        existing_image = gallery_collection.find_one({"id": image_id})
+        existing_image = gallery_collection.find_one({"id": image_id, **NOT_DELETED})
         if not existing_image:
             raise HTTPException(
                 status_code=404,
@@ -1756,9 +5169,9 @@ async def upload_image(image_id: str, file: UploadFile = File(...)):
                 detail=f"File type not allowed. Allowed types: .jpg, .jpeg, .png, .gif, .webp"
             )
         
-        # Read file content to check size
-        file_content = await file.read()
-        if len(file_content) > MAX_FILE_SIZE:
+        # Check size without loading the spooled upload into memory
+        file_size = file.size if file.size is not None else len(await file.read())
+        if file_size > MAX_FILE_SIZE:
             raise HTTPException(
                 status_code=400,
                 detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
@@ -1766,34 +5179,36 @@ async def upload_image(image_id: str, file: UploadFile = File(...)):
         
         # Generate unique filename
         unique_filename = f"{image_id}_{uuid.uuid4().hex[:8]}{file_extension}"
-        file_path = IMAGES_DIR / unique_filename
         
         # Save file
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
+        await file.seek(0)
+        with timed_phase("fs"):
+            await run_storage(image_storage.put, unique_filename, file.file, file.content_type)
+        UPLOAD_FILES.inc(("gallery",))
+        UPLOAD_BYTES.inc(("gallery",), file_size)
         
-        # Update database with new URL
+        # Update database with new URL; a replaced upload is kept for restore until it is purged
         new_url = f"/images/{unique_filename}"
+        previous_url = existing_image.get("current_url")
+        now = datetime.utcnow()
+        update = {"$set": {"current_url": new_url, "updated_at": now}}
+        if (previous_url or "").startswith("/images/"):
+            update["$push"] = {"trashed_files": trashed_image(previous_url, now)}
         update_result = gallery_collection.update_one(
-            {"id": image_id},
-            {
-                "$set": {
-                    "current_url": new_url,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+            {"id": image_id, "current_url": previous_url, **NOT_DELETED},
+            update
         )
+        invalidate_gallery_snapshot()
         
         if update_result.modified_count == 0:
             # Clean up uploaded file if database update failed
-            if file_path.exists():
-                file_path.unlink()
+            await run_storage(image_storage.delete, unique_filename)
             raise HTTPException(
                 status_code=500,
                 detail="Failed to update image in database"
             )
         
-        logger.info(f"Successfully uploaded image for {image_id}: {unique_filename}")
+        logger.info("Successfully uploaded image for %s: %s", image_id, unique_filename)
         
         return {
             "success": True,
@@ -1806,13 +5221,13 @@ async def upload_image(image_id: str, file: UploadFile = File(...)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error uploading image: {e}")
+        logger.error("Error uploading image: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to upload image"
         )
 
-@app.put("/api/website-images/{image_id}")
+@app.put("/api/website-images/{image_id}", dependencies=[Depends(require_admin)])
 async def update_image_metadata(image_id: str, request: Request):
     """Update image metadata (name and description)"""
     try:
@@ -1835,7 +5250,7 @@ async def update_image_metadata(image_id: str, request: Request):
         
         # Update image metadata
         update_result = gallery_collection.update_one(
-            {"id": image_id},
+            {"id": image_id, **NOT_DELETED},
             {
                 "$set": {
                     "name": name,
@@ -1844,6 +5259,7 @@ async def update_image_metadata(image_id: str, request: Request):
                 }
             }
         )
+        invalidate_gallery_snapshot()
         
         if update_result.matched_count == 0:
             raise HTTPException(
@@ -1851,7 +5267,7 @@ async def update_image_metadata(image_id: str, request: Request):
                 detail=f"Image with ID '{image_id}' not found"
             )
         
-        logger.info(f"Updated metadata for image {image_id}")
+        logger.info("Updated metadata for image %s", image_id)
         
         return {
             "success": True,
@@ -1862,13 +5278,95 @@ async def update_image_metadata(image_id: str, request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating image metadata: {e}")
+        logger.error("Error updating image metadata: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to update image metadata"
         )
 
-@app.delete("/api/website-images/{image_id}/reset")
+def reset_gallery_image(image_doc):
+    """Point an image back at its default, moving an uploaded file to trashed_files; returns whether it changed"""
+    current_url = image_doc.get("current_url")
+    now = datetime.utcnow()
+    update = {"$set": {"current_url": image_doc["default_url"], "updated_at": now}}
+    if (current_url or "").startswith("/images/"):
+        update["$push"] = {"trashed_files": trashed_image(current_url, now)}
+    # Only if no upload replaced the file meanwhile, so the trashed entry is the file that lost its reference
+    update_result = gallery_collection.update_one(
+        {"_id": image_doc["_id"], "current_url": current_url, **NOT_DELETED},
+        update
+    )
+    invalidate_gallery_snapshot()
+    return update_result.modified_count > 0
+
+@app.post("/api/website-images/{image_id}/restore", dependencies=[Depends(require_admin)])
+async def restore_image(image_id: str):
+    """Undo a complete deletion, or bring back the most recently removed upload of an image"""
+    if not is_db_connected or gallery_collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    
+    image_doc = gallery_collection.find_one({"id": image_id})
+    if not image_doc:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Image with ID '{image_id}' not found"
+        )
+    
+    now = datetime.utcnow()
+    if image_doc.get("deleted_at") is not None:
+        update_result = gallery_collection.update_one(
+            {"_id": image_doc["_id"], "purge_after": {"$gt": restorable_until(now)}},
+            {"$unset": {"deleted_at": "", "purge_after": ""}}
+        )
+        if update_result.modified_count == 0:
+            raise HTTPException(
+                status_code=410,
+                detail="The grace period for restoring this image has ended"
+            )
+        invalidate_gallery_snapshot()
+        logger.info("Restored image configuration for %s", image_id)
+        return {
+            "success": True,
+            "message": "Image configuration restored",
+            "image_id": image_id,
+            "current_url": image_doc.get("current_url", "")
+        }
+    
+    trashed = [entry for entry in image_doc.get("trashed_files", []) if entry["purge_after"] > restorable_until(now)]
+    if not trashed:
+        raise HTTPException(
+            status_code=404,
+            detail="No deleted upload to restore for this image"
+        )
+    if (image_doc.get("current_url") or "").startswith("/images/"):
+        raise HTTPException(
+            status_code=409,
+            detail="Reset the current upload before restoring an earlier one"
+        )
+    
+    entry = max(trashed, key=lambda item: item["deleted_at"])
+    update_result = gallery_collection.update_one(
+        {"_id": image_doc["_id"], "current_url": image_doc.get("current_url"), "trashed_files.key": entry["key"], **NOT_DELETED},
+        {"$set": {"current_url": entry["url"], "updated_at": now}, "$pull": {"trashed_files": {"key": entry["key"]}}}
+    )
+    if update_result.modified_count == 0:
+        raise HTTPException(
+            status_code=409,
+            detail="The image changed while restoring, please try again"
+        )
+    invalidate_gallery_snapshot()
+    logger.info("Restored upload %s for image %s", entry['key'], image_id)
+    return {
+        "success": True,
+        "message": "Uploaded image restored",
+        "image_id": image_id,
+        "current_url": entry["url"]
+    }
+
+@app.delete("/api/website-images/{image_id}/reset", dependencies=[Depends(require_admin)])
 async def reset_image_to_default(image_id: str):
     """Reset image to its default URL"""
     try:
@@ -1879,40 +5377,22 @@ async def reset_image_to_default(image_id: str):
             )
         
         # Get current image data
-        image_doc = gallery_collection.find_one({"id": image_id})
+        image_doc = gallery_collection.find_one({"id": image_id, **NOT_DELETED})
         if not image_doc:
             raise HTTPException(
                 status_code=404,
                 detail=f"Image with ID '{image_id}' not found"
             )
         
-        # Delete current uploaded file if it exists
-        current_url = image_doc.get("current_url", "")
-        if current_url.startswith("/images/"):
-            file_path = IMAGES_DIR / current_url.replace("/images/", "")
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Deleted uploaded file: {file_path}")
-        
-        # Reset to default URL
+        # Reset to default URL; the uploaded file is purged after the grace period
         default_url = image_doc["default_url"]
-        update_result = gallery_collection.update_one(
-            {"id": image_id},
-            {
-                "$set": {
-                    "current_url": default_url,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
-        
-        if update_result.modified_count == 0:
+        if not reset_gallery_image(image_doc):
             raise HTTPException(
                 status_code=500,
                 detail="Failed to reset image"
             )
         
-        logger.info(f"Reset image {image_id} to default")
+        logger.info("Reset image %s to default", image_id)
         
         return {
             "success": True,
@@ -1924,13 +5404,13 @@ async def reset_image_to_default(image_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error resetting image: {e}")
+        logger.error("Error resetting image: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to reset image"
         )
 
-@app.delete("/api/website-images/{image_id}")
+@app.delete("/api/website-images/{image_id}", dependencies=[Depends(require_admin)])
 async def delete_image(image_id: str, delete_type: str = "image_only"):
     """Delete image (either just the uploaded file or the entire configuration)"""
     try:
@@ -1948,41 +5428,24 @@ async def delete_image(image_id: str, delete_type: str = "image_only"):
             )
         
         # Get current image data
-        image_doc = gallery_collection.find_one({"id": image_id})
+        image_doc = gallery_collection.find_one({"id": image_id, **NOT_DELETED})
         if not image_doc:
             raise HTTPException(
                 status_code=404,
                 detail=f"Image with ID '{image_id}' not found"
             )
         
-        # Delete uploaded file if it exists
-        current_url = image_doc.get("current_url", "")
-        if current_url.startswith("/images/"):
-            file_path = IMAGES_DIR / current_url.replace("/images/", "")
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Deleted uploaded file: {file_path}")
-        
+        # Files are removed by the purge worker after the grace period, never before the database stops using them
         if delete_type == "image_only":
             # Reset to default URL
             default_url = image_doc["default_url"]
-            update_result = gallery_collection.update_one(
-                {"id": image_id},
-                {
-                    "$set": {
-                        "current_url": default_url,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-            
-            if update_result.modified_count == 0:
+            if not reset_gallery_image(image_doc):
                 raise HTTPException(
                     status_code=500,
                     detail="Failed to reset image"
                 )
             
-            logger.info(f"Deleted custom image for {image_id}, reset to default")
+            logger.info("Deleted custom image for %s, reset to default", image_id)
             
             return {
                 "success": True,
@@ -1992,27 +5455,33 @@ async def delete_image(image_id: str, delete_type: str = "image_only"):
             }
         
         else:  # complete deletion
-            # Remove entire image configuration
-            delete_result = gallery_collection.delete_one({"id": image_id})
+            # Hide the entire image configuration until it is purged
+            now = datetime.utcnow()
+            update_result = gallery_collection.update_one(
+                {"_id": image_doc["_id"], **NOT_DELETED},
+                {"$set": {"deleted_at": now, "purge_after": purge_deadline(now)}}
+            )
+            invalidate_gallery_snapshot()
             
-            if delete_result.deleted_count == 0:
+            if update_result.modified_count == 0:
                 raise HTTPException(
                     status_code=500,
                     detail="Failed to delete image configuration"
                 )
             
-            logger.info(f"Completely deleted image configuration for {image_id}")
+            logger.info("Completely deleted image configuration for %s", image_id)
             
             return {
                 "success": True,
                 "message": "Image configuration deleted completely",
-                "image_id": image_id
+                "image_id": image_id,
+                "purge_after": purge_deadline(now).isoformat()
             }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting image: {e}")
+        logger.error("Error deleting image: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to delete image"
@@ -2022,7 +5491,7 @@ async def delete_image(image_id: str, delete_type: str = "image_only"):
 # ENHANCED DEBUG ENDPOINTS
 # ============================================================================
 
-@app.get("/api/debug/status")
+@app.get("/api/debug/status", dependencies=[Depends(require_admin)])
 async def debug_status():
     """Comprehensive debug status endpoint"""
     try:
@@ -2050,7 +5519,7 @@ async def debug_status():
                 if admin_collection:
                     status_info["admin_count"] = admin_collection.count_documents({})
                 if collection:
-                    status_info["submissions_count"] = collection.count_documents({})
+                    status_info["submissions_count"] = collection.count_documents(NOT_DELETED)
                     
             except Exception as e:
                 status_info["mongodb_ping"] = f"failed: {str(e)}"
@@ -2066,7 +5535,7 @@ async def debug_status():
             "timestamp": datetime.utcnow().isoformat()
         }
 
-@app.get("/api/debug/gallery-simple")
+@app.get("/api/debug/gallery-simple", dependencies=[Depends(require_admin)])
 async def debug_gallery_simple():
     """Simple gallery debug without complex processing"""
     try:
@@ -2108,7 +5577,7 @@ async def debug_gallery_simple():
 # DEBUG ENDPOINTS
 # ============================================================================
 
-@app.get("/api/debug/admin")
+@app.get("/api/debug/admin", dependencies=[Depends(require_admin)])
 async def debug_admin():
     """Debug admin data and password hashing"""
     try:
@@ -2131,8 +5600,8 @@ async def debug_admin():
         stored_password = admin.get("password", "")
         
         for test_pwd in test_passwords:
-            hashed = hash_password(test_pwd)
-            matches = verify_password(test_pwd, stored_password)
+            hashed = await asyncio.to_thread(hash_password, test_pwd)
+            matches = await asyncio.to_thread(verify_password, test_pwd, stored_password)
             password_tests[test_pwd] = {
                 "hashed": hashed,
                 "matches_stored": matches
@@ -2153,7 +5622,7 @@ async def debug_admin():
     except Exception as e:
         return {"error": str(e)}
 
-@app.post("/api/debug/reset-admin-password")
+@app.post("/api/debug/reset-admin-password", dependencies=[Depends(require_admin)])
 async def reset_admin_password():
     """Reset admin password to 'mechgenz4'"""
     try:
@@ -2167,7 +5636,7 @@ async def reset_admin_password():
         
         # Reset password to mechgenz4
         new_password = "mechgenz4"
-        hashed_password = hash_password(new_password)
+        hashed_password = await asyncio.to_thread(hash_password, new_password)
         
         # Update password
         result = admin_collection.update_one(
@@ -2183,6 +5652,7 @@ async def reset_admin_password():
         )
         
         if result.modified_count > 0:
+            revoke_sessions({"admin_id": admin["_id"]})
             return {
                 "success": True,
                 "message": "Admin credentials set to mechgenz4@gmail.com / mechgenz4",
@@ -2196,7 +5666,7 @@ async def reset_admin_password():
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/api/debug/gallery")
+@app.get("/api/debug/gallery", dependencies=[Depends(require_admin)])
 async def debug_gallery():
     """Debug endpoint to check gallery data"""
     try:
@@ -2225,7 +5695,7 @@ async def debug_gallery():
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/api/debug/fix-missing-images")
+@app.get("/api/debug/fix-missing-images", dependencies=[Depends(require_admin)])
 async def fix_missing_images():
     """Fix missing image files by resetting them to defaults"""
     try:
@@ -2236,9 +5706,10 @@ async def fix_missing_images():
         missing_files = []
         
         # Get all gallery images
-        cursor = gallery_collection.find({})
+        docs = list(gallery_collection.find({}))
+        file_stats = await stat_uploaded_images(docs)
         
-        for doc in cursor:
+        for doc in docs:
             current_url = doc.get("current_url", "")
             default_url = doc.get("default_url", "")
             image_id = doc.get("id", "")
@@ -2246,9 +5717,8 @@ async def fix_missing_images():
             # Check if current_url points to a local file that doesn't exist
             if current_url.startswith("/images/"):
                 filename = current_url.replace("/images/", "")
-                file_path = IMAGES_DIR / filename
                 
-                if not file_path.exists():
+                if file_stats[filename] is None:
                     # Reset to default URL
                     gallery_collection.update_one(
                         {"_id": doc["_id"]},
@@ -2266,6 +5736,9 @@ async def fix_missing_images():
                         "reset_to": default_url
                     })
         
+        if fixed_count > 0:
+            invalidate_gallery_snapshot()
+        
         return {
             "success": True,
             "fixed_count": fixed_count,
@@ -2276,7 +5749,7 @@ async def fix_missing_images():
     except Exception as e:
         return {"error": str(e)}
 
-@app.post("/api/debug/reinitialize-gallery")
+@app.post("/api/debug/reinitialize-gallery", dependencies=[Depends(require_admin)])
 async def reinitialize_gallery():
     """Force reinitialize gallery data"""
     try:
@@ -2289,6 +5762,7 @@ async def reinitialize_gallery():
         
         # Reinitialize
         success = initialize_gallery_data()
+        invalidate_gallery_snapshot()
         
         return {
             "success": success,
@@ -2298,7 +5772,7 @@ async def reinitialize_gallery():
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/api/debug/check-missing-files")
+@app.get("/api/debug/check-missing-files", dependencies=[Depends(require_admin)])
 async def check_missing_files():
     """Check which image files are missing"""
     try:
@@ -2309,21 +5783,22 @@ async def check_missing_files():
         existing_files = []
         
         # Get all gallery images
-        cursor = gallery_collection.find({})
+        docs = list(gallery_collection.find({}))
+        file_stats = await stat_uploaded_images(docs)
         
-        for doc in cursor:
+        for doc in docs:
             current_url = doc.get("current_url", "")
             image_id = doc.get("id", "")
             
             if current_url.startswith("/images/"):
                 filename = current_url.replace("/images/", "")
-                file_path = IMAGES_DIR / filename
+                file_stat = file_stats[filename]
                 
-                if file_path.exists():
+                if file_stat is not None:
                     existing_files.append({
                         "image_id": image_id,
                         "filename": filename,
-                        "size": file_path.stat().st_size
+                        "size": file_stat["size"]
                     })
                 else:
                     missing_files.append({
@@ -2343,7 +5818,7 @@ async def check_missing_files():
     except Exception as e:
         return {"error": str(e)}
 
-@app.get("/api/stats")
+@app.get("/api/stats", dependencies=[Depends(require_admin)])
 async def get_submission_stats():
     """Get statistics about form submissions"""
     try:
@@ -2354,10 +5829,11 @@ async def get_submission_stats():
             )
         
         # Get total submissions
-        total_submissions = collection.count_documents({})
+        total_submissions = collection.count_documents(NOT_DELETED)
         
         # Get submissions by status
         pipeline = [
+            {"$match": NOT_DELETED},
             {"$group": {"_id": "$status", "count": {"$sum": 1}}},
             {"$sort": {"count": -1}}
         ]
@@ -2367,7 +5843,8 @@ async def get_submission_stats():
         from datetime import timedelta
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         recent_submissions = collection.count_documents({
-            "submitted_at": {"$gte": thirty_days_ago}
+            "submitted_at": {"$gte": thirty_days_ago},
+            **NOT_DELETED
         })
         
         return {
@@ -2382,12 +5859,79 @@ async def get_submission_stats():
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting submission stats: {e}")
+        logger.error("Error getting submission stats: %s", e)
         raise HTTPException(
             status_code=500,
             detail="An error occurred while retrieving statistics"
         )
 
+@app.get("/api/admin/dashboard", dependencies=[Depends(require_admin)])
+async def get_admin_dashboard(request: Request, recent: int = 5):
+    """Stats and the latest submissions for the admin dashboard from one aggregation, cached briefly"""
+    recent = min(max(recent, 1), MAX_DASHBOARD_RECENT)
+    if not is_db_connected or collection is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection not available"
+        )
+    
+    cached = dashboard_cache.get(recent)
+    if cached is not None and time.monotonic() - cached[0] < DASHBOARD_CACHE_TTL:
+        return cached[1].response(request)
+    
+    version = dashboard_version
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    try:
+        # One pass over the collection instead of a count, a group, a count and a find
+        result = next(collection.aggregate([
+            {"$match": NOT_DELETED},
+            {"$facet": {
+                "status_breakdown": [
+                    {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}}
+                ],
+                "recent_30_days": [
+                    {"$match": {"submitted_at": {"$gte": thirty_days_ago}}},
+                    {"$count": "count"}
+                ],
+                "latest": [
+                    {"$sort": {"submitted_at": -1, "_id": -1}},
+                    {"$limit": recent},
+                    {"$project": {
+                        "name": 1,
+                        "email": 1,
+                        "status": 1,
+                        "submitted_at": 1,
+                        "file_count": {"$size": {"$ifNull": ["$uploaded_files", []]}}
+                    }}
+                ]
+            }}
+        ]))
+    except PyMongoError as e:
+        logger.error("MongoDB error building dashboard: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail="Database error occurred while retrieving the dashboard"
+        )
+    
+    status_breakdown = result["status_breakdown"]
+    payload = PrecompressedPayload(orjson.dumps({
+        "success": True,
+        "stats": {
+            "total_submissions": sum(item["count"] for item in status_breakdown),
+            "recent_submissions_30_days": result["recent_30_days"][0]["count"] if result["recent_30_days"] else 0,
+            "status_breakdown": status_breakdown
+        },
+        "recent_submissions": result["latest"],
+        "generated_at": datetime.utcnow()
+    }, default=bson_default))
+    
+    # Only keep the payload if no submission changed while it was being built
+    if version == dashboard_version:
+        dashboard_cache[recent] = (time.monotonic(), payload)
+    
+    return payload.response(request)
+
 @app.get("/api/email-config")
 async def get_email_configuration():
     """Get current email configuration"""
@@ -2403,7 +5947,7 @@ async def get_email_configuration():
         }
     }
 
-@app.get("/api/fix-images-now")
+@app.get("/api/fix-images-now", dependencies=[Depends(require_admin)])
 async def fix_images_now():
     """Quick fix for missing images"""
     try:
@@ -2413,18 +5957,18 @@ async def fix_images_now():
         fixed_count = 0
         
         # Get all gallery images and fix missing ones
-        cursor = gallery_collection.find({})
+        docs = list(gallery_collection.find({}))
+        file_stats = await stat_uploaded_images(docs)
         
-        for doc in cursor:
+        for doc in docs:
             current_url = doc.get("current_url", "")
             default_url = doc.get("default_url", "")
             
             # Check if current_url points to a local file that doesn't exist
             if current_url.startswith("/images/"):
                 filename = current_url.replace("/images/", "")
-                file_path = IMAGES_DIR / filename
                 
-                if not file_path.exists():
+                if file_stats[filename] is None:
                     # Reset to default URL
                     gallery_collection.update_one(
                         {"_id": doc["_id"]},
@@ -2437,6 +5981,9 @@ async def fix_images_now():
                     )
                     fixed_count += 1
         
+        if fixed_count > 0:
+            invalidate_gallery_snapshot()
+        
         return {
             "success": True,
             "fixed_count": fixed_count,
@@ -2460,7 +6007,7 @@ async def not_found_handler(request: Request, exc):
 
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc):
-    logger.error(f"Internal server error: {exc}")
+    logger.error("Internal server error: %s", exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -9,6 +9,7 @@ import GalleryManagement from './components/GalleryManagement';
 import LatestWorks from './components/LatestWorks';
 import FAQManagement from './components/FAQManagement';
 import Settings from './components/Settings';
+import { adminFetch, clearAdminToken, getAdminToken, SESSION_EXPIRED_EVENT } from './adminAuth';
 
 const AdminApp = () => {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
@@ -16,23 +17,34 @@ const AdminApp = () => {
   const location = useLocation();
 
   useEffect(() => {
-    // Check if admin is already logged in
-    const adminToken = localStorage.getItem('adminToken');
-    if (adminToken === 'mechgenz-admin-authenticated') {
+    // Check if admin is already logged in; tokens from before session tokens are discarded
+    const adminToken = getAdminToken();
+    if (adminToken && adminToken !== 'mechgenz-admin-authenticated') {
       setIsAuthenticated(true);
+    } else {
+      clearAdminToken();
     }
     setIsLoading(false);
+
+    // Any admin request answered with 401 returns to the login screen
+    const handleSessionExpired = () => setIsAuthenticated(false);
+    window.addEventListener(SESSION_EXPIRED_EVENT, handleSessionExpired);
+    return () => window.removeEventListener(SESSION_EXPIRED_EVENT, handleSessionExpired);
   }, []);
 
   const handleLogin = (success: boolean) => {
     if (success) {
-      localStorage.setItem('adminToken', 'mechgenz-admin-authenticated');
       setIsAuthenticated(true);
     }
   };
 
-  const handleLogout = () => {
-    localStorage.removeItem('adminToken');
+  const handleLogout = async () => {
+    try {
+      await adminFetch('https://mechgenz-backend.onrender.com/api/admin/logout', { method: 'POST' });
+    } catch (error) {
+      console.error('Logout error:', error);
+    }
+    clearAdminToken();
     setIsAuthenticated(false);
   };
 
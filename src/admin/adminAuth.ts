@@ -0,0 +1,34 @@
+// Admin session token issued by /api/admin/login
+const TOKEN_KEY = 'adminToken';
+export const SESSION_EXPIRED_EVENT = 'mechgenz-admin-session-expired';
+
+export const getAdminToken = (): string | null => localStorage.getItem(TOKEN_KEY);
+
+export const setAdminToken = (token: string) => {
+  localStorage.setItem(TOKEN_KEY, token);
+};
+
+export const clearAdminToken = () => {
+  localStorage.removeItem(TOKEN_KEY);
+  localStorage.removeItem('adminInfo');
+};
+
+// fetch with the session token; a 401 means the session expired or was revoked
+export const adminFetch = async (url: string, init: RequestInit = {}): Promise<Response> => {
+  const headers = new Headers(init.headers);
+  const token = getAdminToken();
+  if (token) {
+    headers.set('Authorization', `Bearer ${token}`);
+  }
+
+  const response = await fetch(url, { ...init, headers });
+  if (response.status === 401) {
+    clearAdminToken();
+    window.dispatchEvent(new Event(SESSION_EXPIRED_EVENT));
+  }
+  return response;
+};
+
+// EventSource cannot send headers, so the event stream takes the token in the URL
+export const adminEventSource = (url: string): EventSource =>
+  new EventSource(`${url}?access_token=${encodeURIComponent(getAdminToken() || '')}`);
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { MessageSquare, Users, Mail, TrendingUp, Calendar, Clock } from 'lucide-react';
+import { adminFetch, adminEventSource } from '../adminAuth';
 
 const AdminDashboard = () => {
   const [stats, setStats] = useState({
@@ -8,32 +9,60 @@ const AdminDashboard = () => {
     repliedInquiries: 0,
     totalProjects: 0
   });
-  const [recentInquiries, setRecentInquiries] = useState([]);
+  const [recentInquiries, setRecentInquiries] = useState<any[]>([]);
   const [isLoading, setIsLoading] = useState(true);
 
   useEffect(() => {
     fetchDashboardData();
+
+    // Live updates: apply stats deltas and new inquiries as they happen instead of refetching
+    const events = adminEventSource('https://mechgenz-backend.onrender.com/api/events');
+    const applyStats = (delta: any) => setStats(prev => ({
+      ...prev,
+      totalInquiries: prev.totalInquiries + (delta.total_submissions || 0),
+      newInquiries: prev.newInquiries + (delta.status_breakdown?.new || 0),
+      repliedInquiries: prev.repliedInquiries + (delta.status_breakdown?.replied || 0)
+    }));
+
+    events.addEventListener('submission.created', (event) => {
+      const data = JSON.parse(event.data);
+      applyStats(data.stats);
+      setRecentInquiries(prev => [data.submission, ...prev].slice(0, 5));
+    });
+    events.addEventListener('submission.updated', (event) => {
+      const data = JSON.parse(event.data);
+      applyStats(data.stats);
+      setRecentInquiries(prev => prev.map(inquiry =>
+        inquiry._id === data.submission_id ? { ...inquiry, status: data.status } : inquiry
+      ));
+    });
+    events.addEventListener('submission.deleted', (event) => {
+      const data = JSON.parse(event.data);
+      applyStats(data.stats);
+      setRecentInquiries(prev => prev.filter(inquiry => inquiry._id !== data.submission_id));
+    });
+    events.addEventListener('submissions.imported', (event) => applyStats(JSON.parse(event.data).stats));
+    // A restored inquiry may belong anywhere in the recent list
+    events.addEventListener('submission.restored', () => fetchDashboardData());
+    // Sent when the server no longer has the events missed while disconnected
+    events.addEventListener('resync', () => fetchDashboardData());
+
+    return () => events.close();
   }, []);
 
   const fetchDashboardData = async () => {
     try {
-      // FIXED: Use correct backend endpoint /api/stats (not /admin/dashboard)
-      const statsResponse = await fetch('https://mechgenz-backend.onrender.com/api/stats');
-      if (statsResponse.ok) {
-        const statsData = await statsResponse.json();
+      // Stats and the latest inquiries in a single round-trip
+      const dashboardResponse = await adminFetch('https://mechgenz-backend.onrender.com/api/admin/dashboard?recent=5');
+      if (dashboardResponse.ok) {
+        const dashboardData = await dashboardResponse.json();
         setStats({
-          totalInquiries: statsData.stats.total_submissions || 0,
-          newInquiries: statsData.stats.status_breakdown?.find(s => s._id === 'new')?.count || 0,
-          repliedInquiries: statsData.stats.status_breakdown?.find(s => s._id === 'replied')?.count || 0,
+          totalInquiries: dashboardData.stats.total_submissions || 0,
+          newInquiries: dashboardData.stats.status_breakdown?.find(s => s._id === 'new')?.count || 0,
+          repliedInquiries: dashboardData.stats.status_breakdown?.find(s => s._id === 'replied')?.count || 0,
           totalProjects: 150 // Static for now
         });
-      }
-
-      // This endpoint is correct
-      const inquiriesResponse = await fetch('https://mechgenz-backend.onrender.com/api/submissions?limit=5');
-      if (inquiriesResponse.ok) {
-        const inquiriesData = await inquiriesResponse.json();
-        setRecentInquiries(inquiriesData.submissions || []);
+        setRecentInquiries(dashboardData.recent_submissions || []);
       }
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { Building, Mail, Lock, Eye, EyeOff } from 'lucide-react';
+import { setAdminToken } from '../adminAuth';
 
 interface AdminLoginProps {
   onLogin: (success: boolean) => void;
@@ -33,8 +34,8 @@ const AdminLogin: React.FC<AdminLoginProps> = ({ onLogin }) => {
       const result = await response.json();
 
       if (response.ok && result.success) {
-        // Store admin info in localStorage
-        localStorage.setItem('adminToken', 'mechgenz-admin-authenticated');
+        // Store the session token and admin info in localStorage
+        setAdminToken(result.token);
         localStorage.setItem('adminInfo', JSON.stringify(result.admin));
         onLogin(true);
       } else {
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Image, Upload, Edit, RotateCcw, Save, X, Eye, Filter, Search, AlertCircle, CheckCircle, Loader, MapPin, Tag, Calendar, RefreshCw, Trash2, Trash } from 'lucide-react';
+import { adminFetch } from '../adminAuth';
 
 interface WebsiteImage {
   id: string;
@@ -175,7 +176,7 @@ const GalleryManagement = () => {
       formData.append('file', file);
 
       // FIXED: Use production backend URL
-      const response = await fetch(`https://mechgenz-backend.onrender.com/api/website-images/${imageId}/upload`, {
+      const response = await adminFetch(`https://mechgenz-backend.onrender.com/api/website-images/${imageId}/upload`, {
         method: 'POST',
         body: formData
       });
@@ -234,7 +235,7 @@ const GalleryManagement = () => {
 
     try {
       // FIXED: Use production backend URL
-      const response = await fetch(`https://mechgenz-backend.onrender.com/api/website-images/${imageId}`, {
+      const response = await adminFetch(`https://mechgenz-backend.onrender.com/api/website-images/${imageId}`, {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
@@ -281,7 +282,7 @@ const GalleryManagement = () => {
 
     try {
       // FIXED: Use production backend URL
-      const response = await fetch(`https://mechgenz-backend.onrender.com/api/website-images/${imageId}/reset`, {
+      const response = await adminFetch(`https://mechgenz-backend.onrender.com/api/website-images/${imageId}/reset`, {
         method: 'DELETE'
       });
 
@@ -334,6 +335,18 @@ const GalleryManagement = () => {
     });
   };
 
+  // Deleted images and configurations stay on the server until they are purged, so a delete can be undone
+  const restoreImage = async (imageId: string) => {
+    const response = await adminFetch(`https://mechgenz-backend.onrender.com/api/website-images/${imageId}/restore`, {
+      method: 'POST'
+    });
+    if (!response.ok) {
+      const result = await response.json();
+      alert(`Failed to restore image: ${result.detail || 'Unknown error'}`);
+    }
+    await fetchImages();
+  };
+
   const handleDeleteImage = async (deleteType: 'image_only' | 'complete') => {
     if (!deleteModal.imageId || !serverConnected) {
       alert('Server is not connected. Please ensure the backend is running.');
@@ -344,7 +357,7 @@ const GalleryManagement = () => {
 
     try {
       // FIXED: Use production backend URL
-      const response = await fetch(`https://mechgenz-backend.onrender.com/api/website-images/${deleteModal.imageId}?delete_type=${deleteType}`, {
+      const response = await adminFetch(`https://mechgenz-backend.onrender.com/api/website-images/${deleteModal.imageId}?delete_type=${deleteType}`, {
         method: 'DELETE'
       });
 
@@ -365,7 +378,9 @@ const GalleryManagement = () => {
           // Clear any error for this image
           setImageErrors(prev => ({ ...prev, [deleteModal.imageId!]: false }));
           
-          alert('Custom image deleted successfully. Image has been reset to default.');
+          if (window.confirm('Custom image deleted. Image has been reset to default.\n\nUndo and restore the deleted image?')) {
+            await restoreImage(deleteModal.imageId!);
+          }
         } else {
           // Remove from local state completely
           setImages(prev => {
@@ -374,7 +389,9 @@ const GalleryManagement = () => {
             return updated;
           });
           
-          alert('Image configuration deleted completely. This image will no longer appear on the website.');
+          if (window.confirm('Image configuration deleted completely. This image will no longer appear on the website.\n\nUndo the deletion?')) {
+            await restoreImage(deleteModal.imageId!);
+          }
         }
         
         // Clear frontend cache
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Settings as SettingsIcon, Save, User, Mail, Lock, Eye, EyeOff, CheckCircle, AlertCircle } from 'lucide-react';
+import { adminFetch } from '../adminAuth';
 
 interface AdminProfile {
   name: string;
@@ -30,7 +31,7 @@ const Settings = () => {
   const fetchAdminProfile = async () => {
     try {
       // FIXED: Use production backend URL
-      const response = await fetch('https://mechgenz-backend.onrender.com/api/admin/profile');
+      const response = await adminFetch('https://mechgenz-backend.onrender.com/api/admin/profile');
       if (response.ok) {
         const data = await response.json();
         setProfile(data.admin);
@@ -121,7 +122,7 @@ const Settings = () => {
       }
       
       // FIXED: Use production backend URL
-      const response = await fetch('https://mechgenz-backend.onrender.com/api/admin/profile', {
+      const response = await adminFetch('https://mechgenz-backend.onrender.com/api/admin/profile', {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
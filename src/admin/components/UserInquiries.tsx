@@ -1,11 +1,13 @@
 import React, { useState, useEffect } from 'react';
 import { Mail, Phone, Calendar, Reply, Eye, Search, Filter, Send, X, CheckCircle, Clock, Download, FileText, Image as ImageIcon, Paperclip, Trash2, Check, Square } from 'lucide-react';
+import { adminFetch, adminEventSource } from '../adminAuth';
 
 interface UploadedFile {
   original_name: string;
   saved_name: string;
   file_size: number;
   content_type: string;
+  download_url?: string;
 }
 
 interface Inquiry {
@@ -17,6 +19,7 @@ interface Inquiry {
   submitted_at: string;
   status: string;
   uploaded_files?: UploadedFile[];
+  spam?: { reasons: string[] };
 }
 
 const UserInquiries = () => {
@@ -35,12 +38,33 @@ const UserInquiries = () => {
 
   useEffect(() => {
     fetchInquiries();
+
+    // Live updates from the server instead of refetching the whole list
+    const events = adminEventSource('https://mechgenz-backend.onrender.com/api/events');
+    events.addEventListener('submission.created', (event) => {
+      const { submission } = JSON.parse(event.data);
+      setInquiries(prev => prev.some(inquiry => inquiry._id === submission._id) ? prev : [submission, ...prev]);
+    });
+    events.addEventListener('submission.updated', (event) => {
+      const { submission_id, status } = JSON.parse(event.data);
+      setInquiries(prev => prev.map(inquiry => inquiry._id === submission_id ? { ...inquiry, status } : inquiry));
+    });
+    events.addEventListener('submission.deleted', (event) => {
+      const { submission_id } = JSON.parse(event.data);
+      setInquiries(prev => prev.filter(inquiry => inquiry._id !== submission_id));
+    });
+    // Restores, imports and missed events are picked up with a full refetch
+    events.addEventListener('submission.restored', () => fetchInquiries());
+    events.addEventListener('submissions.imported', () => fetchInquiries());
+    events.addEventListener('resync', () => fetchInquiries());
+
+    return () => events.close();
   }, []);
 
   const fetchInquiries = async () => {
     try {
       // FIXED: Use production API URL
-      const response = await fetch('https://mechgenz-backend.onrender.com/api/submissions?limit=100');
+      const response = await adminFetch('https://mechgenz-backend.onrender.com/api/submissions?limit=100');
       if (response.ok) {
         const data = await response.json();
         setInquiries(data.submissions || []);
@@ -57,30 +81,23 @@ const UserInquiries = () => {
 
     setIsReplying(true);
     try {
-      // FIXED: Use production API URL for send reply
-      const emailResponse = await fetch('https://mechgenz-backend.onrender.com/api/send-reply', {
+      // Batch reply endpoint sends the email and marks the inquiry as replied in one call
+      const emailResponse = await adminFetch('https://mechgenz-backend.onrender.com/api/send-replies', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          to_email: selectedInquiry.email,
-          to_name: selectedInquiry.name,
-          reply_message: replyMessage,
-          original_message: selectedInquiry.message
+          replies: [
+            {
+              submission_id: selectedInquiry._id,
+              message: replyMessage
+            }
+          ]
         })
       });
 
       if (emailResponse.ok) {
-        // FIXED: Use production API URL for status update
-        await fetch(`https://mechgenz-backend.onrender.com/api/submissions/${selectedInquiry._id}/status`, {
-          method: 'PUT',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({ status: 'replied' })
-        });
-
         // Refresh inquiries
         await fetchInquiries();
         
@@ -138,14 +155,14 @@ const UserInquiries = () => {
     try {
       const deletePromises = Array.from(selectedInquiries).map(async (inquiryId) => {
         // FIXED: Use production API URL for delete
-        const response = await fetch(`https://mechgenz-backend.onrender.com/api/submissions/${inquiryId}`, {
+        const response = await adminFetch(`https://mechgenz-backend.onrender.com/api/submissions/${inquiryId}`, {
           method: 'DELETE'
         });
-        return response.ok;
+        return response.ok ? inquiryId : null;
       });
 
-      const results = await Promise.all(deletePromises);
-      const successCount = results.filter(Boolean).length;
+      const deletedIds = (await Promise.all(deletePromises)).filter((id): id is string => id !== null);
+      const successCount = deletedIds.length;
 
       if (successCount > 0) {
         // Refresh inquiries list
@@ -159,7 +176,13 @@ const UserInquiries = () => {
           setSelectedInquiry(null);
         }
         
-        alert(`Successfully deleted ${successCount} inquir${successCount === 1 ? 'y' : 'ies'}`);
+        // Deleted inquiries are kept on the server until they are purged, so the delete can be undone
+        if (window.confirm(`Successfully deleted ${successCount} inquir${successCount === 1 ? 'y' : 'ies'}.\n\nUndo the deletion?`)) {
+          await Promise.all(deletedIds.map(inquiryId =>
+            adminFetch(`https://mechgenz-backend.onrender.com/api/submissions/${inquiryId}/restore`, { method: 'POST' })
+          ));
+          await fetchInquiries();
+        }
       } else {
         alert('Failed to delete inquiries. Please try again.');
       }
@@ -172,12 +195,14 @@ const UserInquiries = () => {
     }
   };
 
-  const handleDownloadFile = async (fileName: string, originalName: string) => {
+  const handleDownloadFile = async (file: UploadedFile) => {
     if (!selectedInquiry) return;
+    const originalName = file.original_name;
     
     try {
-      // FIXED: Use production API URL for file download
-      const response = await fetch(`https://mechgenz-backend.onrender.com/api/submissions/${selectedInquiry._id}/file/${fileName}`);
+      // Signed URLs are served straight from storage; older API responses fall back to the submission endpoint
+      const downloadUrl = file.download_url ?? `https://mechgenz-backend.onrender.com/api/submissions/${selectedInquiry._id}/file/${file.saved_name}`;
+      const response = await adminFetch(downloadUrl);
       if (response.ok) {
         const blob = await response.blob();
         const url = window.URL.createObjectURL(blob);
@@ -261,6 +286,7 @@ const UserInquiries = () => {
               <option value="all">All Status</option>
               <option value="new">New</option>
               <option value="replied">Replied</option>
+              <option value="spam">Spam</option>
             </select>
           </div>
         </div>
@@ -362,7 +388,9 @@ const UserInquiries = () => {
                             <Paperclip className="h-3 w-3 text-gray-400" />
                           )}
                           <div className={`px-2 py-1 rounded-full text-xs font-medium flex items-center space-x-1 ${
-                            inquiry.status === 'new' 
+                            inquiry.status === 'spam'
+                              ? 'bg-red-100 text-red-800'
+                              : inquiry.status === 'new' 
                               ? 'bg-orange-100 text-orange-800' 
                               : 'bg-green-100 text-green-800'
                           }`}>
@@ -493,7 +521,7 @@ const UserInquiries = () => {
                             </div>
                           </div>
                           <button
-                            onClick={() => handleDownloadFile(file.saved_name, file.original_name)}
+                            onClick={() => handleDownloadFile(file)}
                             className="text-orange-600 hover:text-orange-700 transition-colors duration-200"
                           >
                             <Download className="h-4 w-4" />
@@ -508,7 +536,9 @@ const UserInquiries = () => {
                 <div>
                   <h3 className="text-lg font-semibold text-gray-900 mb-3">Status</h3>
                   <div className={`inline-flex items-center space-x-2 px-3 py-1 rounded-full text-sm font-medium ${
-                    selectedInquiry.status === 'new' 
+                    selectedInquiry.status === 'spam'
+                      ? 'bg-red-100 text-red-800'
+                      : selectedInquiry.status === 'new' 
                       ? 'bg-orange-100 text-orange-800' 
                       : 'bg-green-100 text-green-800'
                   }`}>
@@ -517,8 +547,13 @@ const UserInquiries = () => {
                     ) : (
                       <CheckCircle className="h-4 w-4" />
                     )}
-                    <span>{selectedInquiry.status === 'new' ? 'New Inquiry' : 'Replied'}</span>
+                    <span>{selectedInquiry.status === 'spam' ? 'Spam' : selectedInquiry.status === 'new' ? 'New Inquiry' : 'Replied'}</span>
                   </div>
+                  {selectedInquiry.spam && (
+                    <p className="text-sm text-gray-500 mt-2">
+                      No notification email was sent ({selectedInquiry.spam.reasons.join(', ').replace(/_/g, ' ')})
+                    </p>
+                  )}
                 </div>
               </div>
             </div>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Facebook, Twitter, Instagram, Globe, Phone, Mail, MapPin, Send, User, MessageSquare, Upload, X, FileText, Image as ImageIcon, Paperclip } from 'lucide-react';
 import { useWebsiteImages } from '../hooks/useWebsiteImages';
 
@@ -18,6 +18,8 @@ const Footer = () => {
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [submitStatus, setSubmitStatus] = useState<'idle' | 'success' | 'error'>('idle');
   const [errorMessage, setErrorMessage] = useState('');
+  // Reused when the same form is sent again after a failure, so the server can return the first result
+  const idempotencyKey = useRef<string | null>(null);
 
   useEffect(() => {
     if (!isLoading) {
@@ -38,6 +40,7 @@ const Footer = () => {
 
   const handleInputChange = (e: React.ChangeEvent<HTMLInputElement | HTMLTextAreaElement>) => {
     const { name, value } = e.target;
+    idempotencyKey.current = null;
     setFormData(prev => ({
       ...prev,
       [name]: value
@@ -61,6 +64,7 @@ const Footer = () => {
       alert('Some files were rejected. Please ensure files are under 10MB and in supported formats.');
     }
     
+    idempotencyKey.current = null;
     setUploadedFiles(prev => [...prev, ...validFiles]);
     
     // Reset the input value so the same file can be selected again if needed
@@ -68,6 +72,7 @@ const Footer = () => {
   };
 
   const removeFile = (index: number) => {
+    idempotencyKey.current = null;
     setUploadedFiles(prev => prev.filter((_, i) => i !== index));
   };
 
@@ -106,17 +111,29 @@ const Footer = () => {
         formDataToSend.append('files', file);
       });
 
-      // FIXED: Use production backend URL instead of localhost
-      const response = await fetch('https://mechgenz-backend.onrender.com/api/contact', {
+      idempotencyKey.current = idempotencyKey.current || crypto.randomUUID();
+      const request = {
         method: 'POST',
+        headers: { 'Idempotency-Key': idempotencyKey.current },
         body: formDataToSend
-      });
+      };
+
+      // FIXED: Use production backend URL instead of localhost
+      // A dropped connection is retried once; the idempotency key keeps it from creating a second inquiry
+      let response: Response;
+      try {
+        response = await fetch('https://mechgenz-backend.onrender.com/api/contact', request);
+      } catch {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        response = await fetch('https://mechgenz-backend.onrender.com/api/contact', request);
+      }
 
       const result = await response.json();
 
       if (response.ok) {
         console.log('Form submitted successfully:', result);
         setSubmitStatus('success');
+        idempotencyKey.current = null;
         // Reset form
         setFormData({
           name: '',